@@ -12,15 +12,36 @@ Endpoints:
 """
 
 import os
+
+# Cooperative I/O outside gunicorn's gevent worker (e.g. GEVENT=1 python api.py).
+# Must run before anything else imports socket/ssl/threading.
+if os.getenv("GEVENT", "0") == "1":
+    from gevent import monkey
+
+    monkey.patch_all()
+    from psycogreen.gevent import patch_psycopg
+
+    patch_psycopg()
+
+import decimal
+import hashlib
 import re
+import threading
 import time
-from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta, timezone
+from functools import partial
 
+import orjson
+from cachetools import TTLCache
 from flask import Flask, jsonify, request
-from psycopg2.extras import Json
+from flask.json.provider import JSONProvider
+from werkzeug.http import http_date
+from psycopg2.extras import execute_values
 
 from dotenv import load_dotenv
 
+import cache
 import db
 import data_fetch
 import behavior
@@ -36,27 +57,75 @@ if not os.getenv("ETHERSCAN_API_KEY"):
 if not os.getenv("DATABASE_URL"):
     logger.warning("DATABASE_URL not set. DB features will be disabled.")
 
+
+
+def _orjson_default(o):
+    """Types orjson does not handle natively, serialized the way Flask's default provider does."""
+    if isinstance(o, date):
+        return http_date(o)
+    if isinstance(o, decimal.Decimal):
+        return str(o)
+    if hasattr(o, "__html__"):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+# Sort keys so response field order is consistent; datetimes go through _orjson_default
+_ORJSON_OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+# Pretty-print in development for readability
+if os.getenv("FLASK_DEBUG", "0") == "1":
+    _ORJSON_OPTIONS |= orjson.OPT_INDENT_2
+
+
+class OrjsonProvider(JSONProvider):
+    """jsonify/request.get_json via orjson (C, SIMD) instead of the stdlib json module."""
+
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, default=_orjson_default, option=_ORJSON_OPTIONS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 app = Flask(__name__)
 
 # --- Config: clean JSON and timeouts ---
-# Sort keys so response field order is consistent
-app.config["JSON_SORT_KEYS"] = True
-# Pretty-print in development for readability
-app.config["JSONIFY_PRETTY_PRINT_REGULAR"] = os.getenv("FLASK_DEBUG", "0") == "1"
+app.json = OrjsonProvider(app)
 
 # Max transactions to fetch for /analyze (keeps response time under 60s)
 ANALYZE_TX_LIMIT = 100
 
-# Valid Ethereum address: 0x + 40 hex chars
-WALLET_PATTERN = re.compile(r"^0x[a-fA-F0-9]{40}$")
+# Valid Ethereum address: 0x + 40 hex chars (use with fullmatch)
+WALLET_PATTERN = re.compile(r"0x[0-9a-fA-F]{40}")
 WALLET_MAX_LEN = 42
 
-# Cache: avoid repeated Etherscan calls for the same wallet (TTL in seconds)
+# Cache: avoid repeated Etherscan calls for the same wallet (TTL in seconds, Redis + wallet_intelligence)
 ANALYZE_CACHE_TTL = int(os.getenv("ANALYZE_CACHE_TTL", "300"))  # 5 minutes
 # GET /wallet/<address>: return cached intelligence if last_updated within this many hours
 WALLET_CACHE_TTL_HOURS = 24
 DATA_SOURCE = "WhaleMind MCP"
-_analyze_cache = {}  # key: wallet (lower), value: { "result": {...}, "cached_at": ts }
+# Single-flight: concurrent /analyze misses for the same wallet share one Etherscan fetch.
+# Followers wait up to this many seconds for the leader's result before fetching themselves.
+ANALYZE_INFLIGHT_TIMEOUT = int(os.getenv("ANALYZE_INFLIGHT_TIMEOUT", "30"))
+# Process-local L1 in front of Redis/DB: bounded, entries expire after ANALYZE_CACHE_TTL
+ANALYZE_L1_MAXSIZE = int(os.getenv("ANALYZE_L1_MAXSIZE", "10000"))
+_analyze_cache = TTLCache(maxsize=ANALYZE_L1_MAXSIZE, ttl=ANALYZE_CACHE_TTL)
+_analyze_cache_lock = threading.Lock()
+_inflight: dict[str, dict] = {}  # key: wallet (lower), value: { "done": Event, "result": {...} | None }
+_inflight_lock = threading.Lock()
+# classify_wallet results keyed by (wallet, tx-set fingerprint): unchanged chain data is classified once
+CLASSIFY_CACHE_TTL = int(os.getenv("CLASSIFY_CACHE_TTL", "3600"))  # 1 hour
+# Shared pool for independent blocking DB writes, so they overlap each other and
+# CPU work instead of running back to back on the request thread
+API_IO_WORKERS = int(os.getenv("API_IO_WORKERS", "8"))
+_io_pool = ThreadPoolExecutor(max_workers=API_IO_WORKERS, thread_name_prefix="whalemind-io")
+# /wallet/<address>/balance: concurrent lookups are merged into balancemulti calls
+_balance_fetcher = data_fetch.BatchedBalanceFetcher()
+
+
+def _analyze_cache_key(wallet: str) -> str:
+    """Redis key for a wallet's cached /analyze response."""
+    return f"analyze:{wallet.lower()}"
 
 
 def _error_response(message: str, code: str = "ERROR", status: int = 400):
@@ -74,7 +143,8 @@ def _validate_wallet(wallet):
     wallet = wallet.strip()
     if len(wallet) > WALLET_MAX_LEN:
         return False, "Wallet address too long"
-    if not WALLET_PATTERN.match(wallet):
+    # Cheap gates first: most malformed input never reaches the regex engine
+    if len(wallet) != WALLET_MAX_LEN or not wallet.startswith("0x") or not WALLET_PATTERN.fullmatch(wallet):
         return False, "Invalid wallet: must be 0x followed by 40 hex characters"
     return True, None
 
@@ -97,6 +167,8 @@ def _last_updated_iso(row: dict) -> str:
     lu = row.get("last_updated")
     if isinstance(lu, str):
         return lu
+    if isinstance(lu, (int, float)):
+        return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(lu))
     if lu is not None:
         return lu.isoformat()
     return datetime.now(timezone.utc).isoformat()
@@ -114,55 +186,118 @@ def _row_to_ai_response(row: dict) -> dict:
     )
 
 
+def _remember_analyze(wallet, ai_response: dict):
+    """Put a response into the process-local L1 cache."""
+    with _analyze_cache_lock:
+        _analyze_cache[wallet.lower()] = ai_response
+
+
 def _get_cached_analyze(wallet):
-    """Return cached analyze result: wallet_cache (24h) first, then wallet_intelligence, then in-memory. None on miss."""
-    # 1) wallet_cache (primary, 24h TTL)
+    """
+    Return cached analyze result: process-local L1, then Redis, then wallet_cache (24h),
+    then wallet_intelligence. Lower-tier hits are promoted into L1. None on miss.
+    """
+    # 0) In-process L1 (ANALYZE_CACHE_TTL)
+    with _analyze_cache_lock:
+        cached = _analyze_cache.get(wallet.lower())
+    if cached is not None:
+        return cached
+    # 1) Redis (shared across workers, ANALYZE_CACHE_TTL)
+    cached = cache.get_json(_analyze_cache_key(wallet))
+    if cached and isinstance(cached, dict):
+        _remember_analyze(wallet, cached)
+        return cached
+    # 2) wallet_cache (24h TTL)
     try:
         cached = db.get_wallet_cache(wallet, max_age_hours=24)
         if cached and isinstance(cached, dict):
+            _remember_analyze(wallet, cached)
             return cached
     except Exception as e:
         logger.warning("wallet_cache lookup failed for %s: %s", wallet, e)
-    # 2) wallet_intelligence (short TTL)
+    # 3) wallet_intelligence (short TTL)
     try:
         row = db.get_wallet_intelligence_cache(wallet, max_age_seconds=ANALYZE_CACHE_TTL)
     except Exception as e:
         logger.warning("Cache lookup failed for %s: %s", wallet, e)
         row = None
     if row:
-        return _row_to_ai_response(row)
-    # 3) in-memory
-    key = wallet.lower()
-    entry = _analyze_cache.get(key)
-    if not entry or (time.time() - entry["cached_at"] > ANALYZE_CACHE_TTL):
-        if key in _analyze_cache:
-            del _analyze_cache[key]
-        return None
-    return entry["result"]
+        cached = _row_to_ai_response(row)
+        _remember_analyze(wallet, cached)
+        return cached
+    return None
 
 
-def _set_cached_analyze(wallet, ai_response: dict, metrics_used: dict | None = None):
-    """Store result in wallet_cache (primary), wallet_intelligence, and in-memory cache."""
-    _analyze_cache[wallet.lower()] = {"result": ai_response, "cached_at": time.time()}
-    try:
-        db.save_wallet_cache(wallet, ai_response)
-    except Exception as e:
-        logger.warning("wallet_cache save failed for %s: %s", wallet, e)
-    try:
-        db.save_wallet_intelligence_cache(
+def _run_concurrently(*tasks):
+    """Run independent no-arg callables on the I/O pool and wait for all. Failures are logged, not raised."""
+    futures = {_io_pool.submit(task): getattr(task, "func", task).__name__ for task in tasks}
+    for future in as_completed(futures):
+        try:
+            future.result()
+        except Exception as e:
+            logger.warning("%s failed: %s", futures[future], e)
+
+
+def _set_cached_analyze(wallet, ai_response: dict, metrics_used: dict | None = None, extra_writes=()):
+    """
+    Store result in the L1 cache, Redis, wallet_cache (primary DB cache), and wallet_intelligence.
+    Redis is written first (other workers poll it); the DB writes, plus any extra_writes
+    callables, run concurrently on the I/O pool.
+    """
+    _remember_analyze(wallet, ai_response)
+    cache.set_json(_analyze_cache_key(wallet), ai_response, ANALYZE_CACHE_TTL)
+    _run_concurrently(
+        partial(db.save_wallet_cache, wallet, ai_response),
+        partial(
+            db.save_wallet_intelligence_cache,
             address=ai_response["address"],
             verdict=ai_response["verdict"],
             confidence=ai_response["confidence"],
             entity_type=ai_response["entity_type"],
             behavior_json=metrics_used,
             summary=ai_response["summary"],
-        )
-    except Exception as e:
-        logger.warning("Cache save failed for %s: %s", wallet, e)
+        ),
+        *extra_writes,
+    )
+
+
+def _tx_fingerprint(transactions: list) -> str:
+    """Short digest of the tx hashes; changes as soon as a new transaction appears."""
+    joined = "".join(tx.get("hash") or "" for tx in transactions)
+    return hashlib.blake2b(joined.encode(), digest_size=16).hexdigest()
+
+
+def _classify_cached(wallet: str, transactions: list) -> dict:
+    """intelligence.classify_wallet memoized in Redis by (wallet, tx fingerprint). Empty tx lists are not cached."""
+    if not transactions:
+        return intelligence.classify_wallet(transactions, wallet, include_metrics=True)
+    key = f"classify:{wallet.lower()}:{_tx_fingerprint(transactions)}"
+    cached = cache.get_json(key)
+    if cached and isinstance(cached, dict):
+        return {**cached, "address": wallet}
+    result = intelligence.classify_wallet(transactions, wallet, include_metrics=True)
+    cache.set_json(key, result, CLASSIFY_CACHE_TTL)
+    return result
 
 
-def _is_cache_fresh(last_updated, max_hours: int = WALLET_CACHE_TTL_HOURS) -> bool:
-    """True if last_updated is within max_hours of now (UTC)."""
+def _wait_for_cached_analyze(wallet, timeout: float):
+    """Poll Redis for a result another worker is computing. None if it does not appear within timeout."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        cached = cache.get_json(_analyze_cache_key(wallet))
+        if cached and isinstance(cached, dict):
+            return cached
+        time.sleep(0.1)
+    return None
+
+
+def _is_cache_fresh(last_updated, max_hours: int = WALLET_CACHE_TTL_HOURS, last_updated_epoch=None) -> bool:
+    """
+    True if last_updated is within max_hours of now (UTC).
+    Uses last_updated_epoch (Unix seconds) when given; parses last_updated only for legacy rows.
+    """
+    if last_updated_epoch is not None:
+        return time.time() - last_updated_epoch < max_hours * 3600
     if last_updated is None:
         return False
     if isinstance(last_updated, str):
@@ -184,9 +319,12 @@ def _wallet_analysis_from_cache(address: str) -> dict | None:
     except Exception as e:
         logger.warning("Cache lookup failed for %s: %s", address, e)
         return None
-    if not row or not _is_cache_fresh(row.get("last_updated")):
+    if not row:
+        return None
+    metrics = dict(row.get("behavior_json") or {})
+    last_updated_epoch = metrics.pop("last_updated_epoch", None)
+    if not _is_cache_fresh(row.get("last_updated"), last_updated_epoch=last_updated_epoch):
         return None
-    metrics = row.get("behavior_json") or {}
     return {
         "address": row["address"],
         "cached": True,
@@ -213,6 +351,13 @@ def _verdict_to_behavior(verdict):
     return VERDICT_TO_BEHAVIOR.get(verdict, "neutral")
 
 
+# Rows come from data_fetch.normalize_tx_for_db, bound positionally in TX_DB_COLUMNS order
+_INSERT_TRANSACTIONS_SQL = (
+    f"INSERT INTO transactions ({', '.join(data_fetch.TX_DB_COLUMNS)}) VALUES %s "
+    "ON CONFLICT (tx_hash) DO NOTHING;"
+)
+
+
 def _persist_wallet_transactions(conn, address: str, transactions: list, limit: int):
     """Upsert wallet and insert transactions. Caller must commit/rollback/close."""
     with db.get_cursor(conn) as cur:
@@ -221,22 +366,25 @@ def _persist_wallet_transactions(conn, address: str, transactions: list, limit:
             "ON CONFLICT (address) DO UPDATE SET last_seen_at = NOW();",
             (address,),
         )
-        for tx in transactions[:limit]:
-            row = data_fetch.normalize_tx_for_db(tx)
-            try:
-                ts = int(row.get("timestamp")) if row.get("timestamp") is not None else 0
-            except (TypeError, ValueError):
-                ts = 0
-            cur.execute(
-                """
-                INSERT INTO transactions
-                (wallet_address, tx_hash, from_address, to_address, value_wei, block_number, timestamp, raw_data)
-                VALUES (%(wallet_address)s, %(tx_hash)s, %(from_address)s, %(to_address)s,
-                        %(value_wei)s, %(block_number)s, to_timestamp(%(ts)s), %(raw_data)s)
-                ON CONFLICT (tx_hash) DO NOTHING;
-                """,
-                {**row, "ts": ts, "raw_data": Json(row.get("raw_data") or {})},
-            )
+        rows = [data_fetch.normalize_tx_for_db(tx) for tx in transactions[:limit]]
+        if not rows:
+            return
+        # One multi-VALUES INSERT per page instead of one round-trip per transaction
+        execute_values(
+            cur,
+            _INSERT_TRANSACTIONS_SQL,
+            rows,
+            template="(%s, %s, %s, %s, %s, %s, to_timestamp(%s), %s)",
+            page_size=500,
+        )
+
+
+def _save_wallet_transactions(address: str, transactions: list, limit: int):
+    """Persist wallet + transactions on a pooled connection (no-op without DB). Raises on DB error."""
+    with db.get_conn() as conn:
+        if conn:
+            _persist_wallet_transactions(conn, address, transactions, limit)
+            conn.commit()
 
 
 @app.route("/", methods=["GET"])
@@ -261,7 +409,7 @@ def db_test():
     """Connect to DB, run SELECT 1, return JSON success message. For Railway DB verification."""
     conn = None
     try:
-        conn = db.get_db_connection()
+        conn = db.get_connection()
         if not conn:
             return jsonify({"status": "error", "message": "DATABASE_URL not set or invalid"}), 503
         with conn.cursor() as cur:
@@ -305,27 +453,64 @@ def analyze():
     if cached is not None:
         return jsonify(cached)
 
+    # 3) Single-flight: only one request per wallet goes upstream; the rest reuse its result
+    key = wallet.lower()
+    with _inflight_lock:
+        flight = _inflight.get(key)
+        leader = flight is None
+        if leader:
+            flight = _inflight[key] = {"done": threading.Event(), "result": None}
+    if not leader:
+        flight["done"].wait(timeout=ANALYZE_INFLIGHT_TIMEOUT)
+        cached = flight["result"] or _get_cached_analyze(wallet)
+        if cached is not None:
+            return jsonify(cached)
+        # Leader failed or timed out: analyze ourselves
+
     try:
+        ai_response = _run_analyze(wallet)
+        if leader:
+            flight["result"] = ai_response
+        return jsonify(ai_response)
+    except Exception as e:
+        logger.exception("Analyze failed for %s: %s", wallet, e)
+        return _error_response(
+            "Analysis failed. Please try again later.",
+            "ANALYSIS_ERROR",
+            500,
+        )
+    finally:
+        if leader:
+            with _inflight_lock:
+                _inflight.pop(key, None)
+            flight["done"].set()
+
+
+def _run_analyze(wallet) -> dict:
+    """
+    Cache miss path for /analyze: fetch → classify → save. Returns the AI response dict.
+    Across workers, a Redis lock elects one fetcher; the others poll Redis for its result.
+    """
+    with cache.lock(f"lock:{_analyze_cache_key(wallet)}", ANALYZE_INFLIGHT_TIMEOUT) as holder:
+        if not holder:
+            cached = _wait_for_cached_analyze(wallet, ANALYZE_INFLIGHT_TIMEOUT)
+            if cached is not None:
+                return cached
+
         transactions = data_fetch.fetch_transactions(wallet, limit=ANALYZE_TX_LIMIT)
-        result = intelligence.classify_wallet(transactions, wallet, include_metrics=True)
+        result = _classify_cached(wallet, transactions)
         verdict, confidence = result["verdict"], result["confidence"]
         entity_type = result.get("entity_type") or result["entity_inference"]
 
-        db.save_wallet_intel(wallet, _verdict_to_behavior(verdict), confidence, verdict)
-
         ai_response = _format_ai_response(
             result["address"], verdict, confidence, entity_type,
             result["behavior_summary"], datetime.now(timezone.utc).isoformat(),
         )
-        _set_cached_analyze(wallet, ai_response, result.get("metrics_used"))
-        return jsonify(ai_response)
-    except Exception as e:
-        logger.exception("Analyze failed for %s: %s", wallet, e)
-        return _error_response(
-            "Analysis failed. Please try again later.",
-            "ANALYSIS_ERROR",
-            500,
+        _set_cached_analyze(
+            wallet, ai_response, result.get("metrics_used"),
+            extra_writes=(partial(db.save_wallet_intel, wallet, _verdict_to_behavior(verdict), confidence, verdict),),
         )
+        return ai_response
 
 
 @app.route("/wallet/<address>/balance", methods=["GET"])
@@ -335,7 +520,7 @@ def wallet_balance(address):
     if not ok:
         return _error_response(err, "VALIDATION_ERROR", 400)
     try:
-        balance_wei = data_fetch.fetch_balance(address)
+        balance_wei = _balance_fetcher.fetch(address, timeout=2 * data_fetch.REQUEST_TIMEOUT)
     except Exception as e:
         logger.warning("Balance fetch failed for %s: %s", address, e)
         return _error_response("Failed to fetch balance", "UPSTREAM_ERROR", 502)
@@ -384,19 +569,13 @@ def wallet_analysis(address):
             "message": "No transactions found or API error.",
         }), 200
 
-    # Analyze behavior
+    # Persist on the I/O pool while behavior is analyzed on this thread
+    persist = _io_pool.submit(_save_wallet_transactions, address, transactions, limit)
     behavior_result = behavior.summarize_behavior(transactions, wallet_address=address)
-
-    conn = db.get_db_connection()
-    if conn:
-        try:
-            _persist_wallet_transactions(conn, address, transactions, limit)
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            logger.warning("DB persist failed for %s: %s", address, e)
-        finally:
-            db.close_connection(conn)
+    try:
+        persist.result()
+    except Exception as e:
+        logger.warning("DB persist failed for %s: %s", address, e)
 
     return jsonify({
         "address": address,
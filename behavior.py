@@ -5,21 +5,65 @@ Analyzes transaction history to derive simple behavior metrics
 (e.g. activity level, big transfers).
 """
 
-from datetime import datetime
+import time
 from decimal import Decimal
 
-# 1 ETH in wei (for human-readable comparisons)
-WEI_PER_ETH = 10**18
+import numpy as np
+
+# Transfers >= this many ETH count as "large"
+LARGE_TRANSFER_ETH = 10.0
+
+# Use the vectorized NumPy path from this many transactions up
+# (below it, array setup costs more than the Python loop it replaces)
+NUMPY_MIN_TXS = 64
+
+# Divisor for the Decimal fallback in wei_to_eth (non-integer wei strings)
+WEI_PER_ETH = Decimal(10**18)
 
 
 def wei_to_eth(wei_str):
-    """Convert wei (string) to ETH (float). Returns 0.0 if invalid."""
+    """
+    Convert wei (string) to ETH (float). Returns 0.0 if invalid.
+    Integer strings (Etherscan's format) take the int fast path; anything else ("1.5",
+    "1e18", values too large for a float) goes through Decimal.
+    """
+    try:
+        return int(wei_str) / 1e18
+    except TypeError:
+        return 0.0
+    except (ValueError, OverflowError):
+        pass
     try:
         return float(Decimal(wei_str) / WEI_PER_ETH)
-    except (TypeError, ValueError, Decimal.InvalidOperation):
+    except (ValueError, ArithmeticError):  # InvalidOperation is an ArithmeticError
         return 0.0
 
 
+def safe_int(value, default=0):
+    """
+    int(value) for Etherscan numeric fields (ints or decimal strings); default if missing/invalid.
+    try/except is free on CPython 3.11+ when nothing is raised, so the well-formed case stays cheap.
+    """
+    if isinstance(value, int):
+        return value
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _parse_timestamps(transactions):
+    """
+    timeStamp of each tx as int, missing/invalid ones skipped. Etherscan always sends decimal
+    strings, so convert the whole column in one pass and only check per row if that fails.
+    """
+    try:
+        return [int(tx["timeStamp"]) for tx in transactions]
+    except (KeyError, TypeError, ValueError):
+        parsed = (safe_int(tx.get("timeStamp"), None) for tx in transactions)
+        return [ts for ts in parsed if ts is not None]
+
+
 def analyze_transactions(transactions, wallet_address=None):
     """
     Analyze a list of transactions and return behavior metrics.
@@ -32,59 +76,195 @@ def analyze_transactions(transactions, wallet_address=None):
         Dict with: total_txs, total_in_eth, total_out_eth, unique_counterparties,
         first_seen, last_seen, large_transfers_count.
     """
+    if len(transactions) >= NUMPY_MIN_TXS:
+        accumulate = _accumulate_np
+    else:
+        accumulate = _accumulate
+    return _metrics_dict(len(transactions), *accumulate(transactions, wallet_address))
+
+
+def analyze_transactions_extended(transactions, wallet_address=None):
+    """
+    analyze_transactions plus the per-tx columns the intelligence layer needs, built in the
+    same pass (each value converted and each address lowercased once).
+
+    Returns:
+        (metrics, values_eth, timestamps, is_out, is_in): metrics as from analyze_transactions;
+        values_eth per tx; timestamps parsed (invalid ones skipped); is_out / is_in per-tx flags
+        relative to wallet_address (all False without one). values_eth, is_out and is_in are
+        NumPy arrays from NUMPY_MIN_TXS transactions up, plain lists below.
+    """
+    if len(transactions) >= NUMPY_MIN_TXS:
+        acc = _accumulate_np_columns(transactions, wallet_address)
+    else:
+        acc = _accumulate_columns(transactions, (wallet_address or "").lower())
+    *base, values_eth, is_out, is_in = acc
+    timestamps = base[4]
+    return _metrics_dict(len(transactions), *base), values_eth, timestamps, is_out, is_in
+
+
+def _metrics_dict(total_txs, total_in_eth, total_out_eth, counterparties, large_transfers, timestamps):
+    """Shape accumulator output into the analyze_transactions result dict."""
+    return {
+        "total_txs": total_txs,
+        "total_in_eth": round(total_in_eth, 4),
+        "total_out_eth": round(total_out_eth, 4),
+        "unique_counterparties": len(counterparties),
+        "first_seen": min(timestamps) if timestamps else None,
+        "last_seen": max(timestamps) if timestamps else None,
+        "large_transfers_count": large_transfers,
+    }
+
+
+def _accumulate(transactions, wallet_address):
+    """Per-tx loop. Returns (total_in_eth, total_out_eth, counterparties, large_transfers, timestamps)."""
+    # Pick the specialized loop once instead of branching on wallet_address per tx
+    if wallet_address:
+        return _accumulate_with_wallet(transactions, wallet_address.lower())
+    return _accumulate_no_wallet(transactions)
+
+
+def _accumulate_with_wallet(transactions, addr_lower):
+    """Count in/out relative to addr_lower (already lowercased)."""
     total_in_eth = 0.0
     total_out_eth = 0.0
     counterparties = set()
     large_transfers = 0
-    timestamps = []
+    timestamps = _parse_timestamps(transactions)
+    cp_add = counterparties.add
 
     for tx in transactions:
         from_addr = (tx.get("from") or "").lower()
         to_addr = (tx.get("to") or "").lower()
-        value_wei = tx.get("value") or "0"
-        value_eth = wei_to_eth(value_wei)
-        ts = tx.get("timeStamp")
-        if ts:
-            try:
-                timestamps.append(int(ts))
-            except (TypeError, ValueError):
-                pass
-
-        # If we're analyzing for a specific wallet, count in/out relative to it
-        if wallet_address:
-            addr_lower = wallet_address.lower()
-            if from_addr == addr_lower:
-                total_out_eth += value_eth
-                if to_addr:
-                    counterparties.add(to_addr)
-            if to_addr == addr_lower:
-                total_in_eth += value_eth
-                if from_addr:
-                    counterparties.add(from_addr)
-        else:
-            # No specific wallet: just sum all movement and count unique addresses
+        try:
+            value_eth = int(tx.get("value") or "0") / 1e18
+        except (TypeError, ValueError):
+            value_eth = 0.0
+
+        if from_addr == addr_lower:
             total_out_eth += value_eth
-            if from_addr:
-                counterparties.add(from_addr)
             if to_addr:
-                counterparties.add(to_addr)
+                cp_add(to_addr)
+        if to_addr == addr_lower:
+            total_in_eth += value_eth
+            if from_addr:
+                cp_add(from_addr)
 
         # Count "large" transfers (e.g. >= 10 ETH)
-        if value_eth >= 10.0:
+        if value_eth >= LARGE_TRANSFER_ETH:
             large_transfers += 1
 
-    first_seen = min(timestamps) if timestamps else None
-    last_seen = max(timestamps) if timestamps else None
+    return total_in_eth, total_out_eth, counterparties, large_transfers, timestamps
 
-    return {
-        "total_txs": len(transactions),
-        "total_in_eth": round(total_in_eth, 4),
-        "total_out_eth": round(total_out_eth, 4),
-        "unique_counterparties": len(counterparties),
-        "first_seen": first_seen,
-        "last_seen": last_seen,
-        "large_transfers_count": large_transfers,
-    }
+
+def _accumulate_no_wallet(transactions):
+    """No specific wallet: just sum all movement and count unique addresses."""
+    total_out_eth = 0.0
+    counterparties = set()
+    large_transfers = 0
+    timestamps = _parse_timestamps(transactions)
+    cp_add = counterparties.add
+
+    for tx in transactions:
+        from_addr = (tx.get("from") or "").lower()
+        to_addr = (tx.get("to") or "").lower()
+        try:
+            value_eth = int(tx.get("value") or "0") / 1e18
+        except (TypeError, ValueError):
+            value_eth = 0.0
+
+        total_out_eth += value_eth
+        if from_addr:
+            cp_add(from_addr)
+        if to_addr:
+            cp_add(to_addr)
+
+        if value_eth >= LARGE_TRANSFER_ETH:
+            large_transfers += 1
+
+    return 0.0, total_out_eth, counterparties, large_transfers, timestamps
+
+
+def _accumulate_columns(transactions, addr_lower):
+    """_accumulate plus per-tx (values_eth, is_out, is_in) lists, for analyze_transactions_extended."""
+    if not addr_lower:
+        values_eth = [wei_to_eth(tx.get("value") or "0") for tx in transactions]
+        flags = [False] * len(transactions)
+        return (*_accumulate_no_wallet(transactions), values_eth, flags, flags)
+
+    total_in_eth = 0.0
+    total_out_eth = 0.0
+    counterparties = set()
+    large_transfers = 0
+    timestamps = _parse_timestamps(transactions)
+    values_eth = []
+    is_out = []
+    is_in = []
+    cp_add = counterparties.add
+
+    for tx in transactions:
+        from_addr = (tx.get("from") or "").lower()
+        to_addr = (tx.get("to") or "").lower()
+        try:
+            value_eth = int(tx.get("value") or "0") / 1e18
+        except (TypeError, ValueError):
+            value_eth = 0.0
+
+        outgoing = from_addr == addr_lower
+        incoming = to_addr == addr_lower
+        if outgoing:
+            total_out_eth += value_eth
+            if to_addr:
+                cp_add(to_addr)
+        if incoming:
+            total_in_eth += value_eth
+            if from_addr:
+                cp_add(from_addr)
+        if value_eth >= LARGE_TRANSFER_ETH:
+            large_transfers += 1
+        values_eth.append(value_eth)
+        is_out.append(outgoing)
+        is_in.append(incoming)
+
+    return total_in_eth, total_out_eth, counterparties, large_transfers, timestamps, values_eth, is_out, is_in
+
+
+def _accumulate_np(transactions, wallet_address):
+    """Vectorized equivalent of _accumulate: one column extraction, then NumPy masks and sums."""
+    return _accumulate_np_columns(transactions, wallet_address)[:5]
+
+
+def _accumulate_np_columns(transactions, wallet_address):
+    """_accumulate_np plus its (val_arr, is_out, is_in) columns, for analyze_transactions_extended."""
+    n = len(transactions)
+    from_raw = [tx.get("from") or "" for tx in transactions]
+    to_raw = [tx.get("to") or "" for tx in transactions]
+    # Lowercase each distinct address once (histories repeat the same few addresses)
+    lowered = {a: a.lower() for a in {*from_raw, *to_raw}}
+    from_arr = np.fromiter(map(lowered.__getitem__, from_raw), dtype=object, count=n)
+    to_arr = np.fromiter(map(lowered.__getitem__, to_raw), dtype=object, count=n)
+    val_arr = np.fromiter((wei_to_eth(tx.get("value") or "0") for tx in transactions), dtype=np.float64, count=n)
+
+    timestamps = _parse_timestamps(transactions)
+
+    if wallet_address:
+        addr_lower = wallet_address.lower()
+        is_out = from_arr == addr_lower
+        is_in = to_arr == addr_lower
+        total_out_eth = float(val_arr[is_out].sum())
+        total_in_eth = float(val_arr[is_in].sum())
+        cp_parts = (to_arr[is_out & (to_arr != "")], from_arr[is_in & (from_arr != "")])
+    else:
+        total_out_eth = float(val_arr.sum())
+        total_in_eth = 0.0
+        cp_parts = (from_arr[from_arr != ""], to_arr[to_arr != ""])
+        is_out = is_in = np.zeros(n, dtype=np.bool_)
+
+    counterparties = set(cp_parts[0].tolist())
+    counterparties.update(cp_parts[1].tolist())
+
+    large_transfers = int(np.count_nonzero(val_arr >= LARGE_TRANSFER_ETH))
+    return total_in_eth, total_out_eth, counterparties, large_transfers, timestamps, val_arr, is_out, is_in
 
 
 def summarize_behavior(transactions, wallet_address=None):
@@ -97,8 +277,8 @@ def summarize_behavior(transactions, wallet_address=None):
     for key, ts in [("first_seen", result.get("first_seen")), ("last_seen", result.get("last_seen"))]:
         if ts is not None:
             try:
-                result[f"{key}_iso"] = datetime.utcfromtimestamp(int(ts)).isoformat() + "Z"
-            except (TypeError, ValueError, OSError):
+                result[f"{key}_iso"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(int(ts)))
+            except (TypeError, ValueError, OSError, OverflowError):
                 result[f"{key}_iso"] = None
         else:
             result[f"{key}_iso"] = None
@@ -0,0 +1,92 @@
+"""
+WhaleMind MCP - Shared Redis cache.
+
+Optional: enabled only when REDIS_URL is set (e.g. redis://localhost:6379/0).
+Shared across gunicorn workers and restarts; memory is bounded by the Redis
+eviction policy. All helpers degrade to a cache miss / no-op write when Redis
+is not configured or unreachable, so the API keeps working without it.
+"""
+
+import json
+import os
+from contextlib import contextmanager
+
+import redis
+from dotenv import load_dotenv
+
+from config import get_logger
+
+load_dotenv()
+logger = get_logger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL") or None
+# Keep Redis off the critical path: fail fast and fall through to the DB cache.
+REDIS_TIMEOUT = float(os.getenv("REDIS_TIMEOUT", "1.0"))
+
+_client = (
+    redis.Redis.from_url(
+        REDIS_URL,
+        decode_responses=True,
+        socket_timeout=REDIS_TIMEOUT,
+        socket_connect_timeout=REDIS_TIMEOUT,
+    )
+    if REDIS_URL
+    else None
+)
+
+
+def get_json(key: str):
+    """Return the decoded JSON value stored at key, or None on miss/error."""
+    if _client is None:
+        return None
+    try:
+        raw = _client.get(key)
+    except redis.RedisError as e:
+        logger.warning("Redis get failed for %s: %s", key, e)
+        return None
+    if raw is None:
+        return None
+    try:
+        return json.loads(raw)
+    except ValueError:
+        logger.debug("Redis value for %s is not valid JSON", key)
+        return None
+
+
+def set_json(key: str, value, ttl: int) -> bool:
+    """SETEX key ttl json(value). Returns True on success, False otherwise (no raise)."""
+    if _client is None:
+        return False
+    try:
+        _client.setex(key, ttl, json.dumps(value))
+        return True
+    except (redis.RedisError, TypeError, ValueError) as e:
+        logger.warning("Redis set failed for %s: %s", key, e)
+        return False
+
+
+@contextmanager
+def lock(key: str, ttl: int):
+    """
+    Non-blocking distributed lock (SET NX EX) for cross-worker single-flight.
+    Yields True if this caller holds the lock (or Redis is disabled/unreachable),
+    False if another worker currently holds it. Released on exit; expires after ttl.
+    """
+    if _client is None:
+        yield True
+        return
+    redis_lock = _client.lock(key, timeout=ttl)
+    try:
+        acquired = redis_lock.acquire(blocking=False)
+    except redis.RedisError as e:
+        logger.warning("Redis lock failed for %s: %s", key, e)
+        yield True
+        return
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            try:
+                redis_lock.release()
+            except redis.RedisError as e:
+                logger.debug("Redis lock release failed for %s: %s", key, e)
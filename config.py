@@ -21,12 +21,13 @@ def setup_logging(level: str | None = None):
         numeric = getattr(logging, lvl)
     except AttributeError:
         numeric = logging.INFO
-    logging.basicConfig(
-        level=numeric,
-        format=LOG_FORMAT,
-        stream=sys.stderr,
-        datefmt="%Y-%m-%d %H:%M:%S",
-    )
+    # LOG_FORMAT never uses thread/process fields; skip computing them per record.
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT, datefmt="%Y-%m-%d %H:%M:%S", validate=False))
+    logging.basicConfig(level=numeric, handlers=[handler])
 
 
 def get_logger(name: str) -> logging.Logger:
@@ -2,14 +2,31 @@
 WhaleMind MCP - Blockchain data fetching.
 
 Fetches wallet transactions (e.g. from Etherscan-style API)
-and optionally stores them via db module.
+and optionally stores them via db module. fetch_transactions_async is the
+aiohttp variant for batch jobs that fetch many wallets concurrently.
 """
 
+import asyncio
+import atexit
+import logging
 import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from email.utils import parsedate_to_datetime
+
+import aiohttp
+import orjson
 import requests
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
+from behavior import safe_int
 from config import get_logger
+from db import Jsonb
 
 load_dotenv()
 
@@ -25,24 +42,157 @@ CHAIN_ID = 1
 # Timeout for HTTP calls (seconds). Prevents hanging on slow or stuck APIs.
 REQUEST_TIMEOUT = int(os.getenv("ETHERSCAN_REQUEST_TIMEOUT", "25"))
 
+# Keep-alive connections kept open to Etherscan (sync session and async connector alike);
+# size to the number of concurrent callers, e.g. PRECOMPUTE_CONCURRENCY or gunicorn threads.
+HTTP_POOL_SIZE = int(os.getenv("ETHERSCAN_POOL_SIZE", "32"))
+# Seconds an idle async connection is kept for reuse
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("ETHERSCAN_KEEPALIVE_TIMEOUT", "60"))
+
+# Shared keep-alive session: reuses TCP+TLS connections to Etherscan across calls.
+# Transient HTTP errors (429/5xx) are retried with backoff at the transport level.
+_SESSION = requests.Session()
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=HTTP_POOL_SIZE,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET"],
+        ),
+    ),
+)
+atexit.register(_SESSION.close)
+
+# Client-side rate limit shared by all Etherscan calls in this process (free keys: 5 calls/s).
+ETHERSCAN_RATE_LIMIT = int(os.getenv("ETHERSCAN_RATE_LIMIT", "5"))
+# Attempts per call when Etherscan answers with a rate-limit body instead of data
+RATE_LIMIT_MAX_ATTEMPTS = 4
+_call_times = deque(maxlen=max(1, ETHERSCAN_RATE_LIMIT))  # scheduled start times, 1s sliding window
+_call_times_lock = threading.Lock()
+
+
+# HTTP statuses retried by the async path (the sync session retries these in urllib3)
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+# Upper bound on a server-requested Retry-After wait (seconds)
+RETRY_AFTER_MAX = float(os.getenv("ETHERSCAN_RETRY_AFTER_MAX", "60"))
+
+
+def _reserve_call_slot() -> float:
+    """Claim the next call slot in the 1-second window (sliding-log token bucket); return seconds to wait."""
+    with _call_times_lock:
+        now = time.monotonic()
+        start = now
+        if len(_call_times) == _call_times.maxlen:
+            start = max(now, _call_times[0] + 1.0)
+        _call_times.append(start)
+    return start - now
 
-def fetch_transactions(address, limit=100):
+
+def _throttle():
+    """Block until a call slot is free."""
+    delay = _reserve_call_slot()
+    if delay > 0:
+        time.sleep(delay)
+
+
+def _backoff_delay(attempt: int) -> float:
+    """Jittered exponential backoff before retry number attempt + 1."""
+    return 0.2 * 2**attempt + random.random() * 0.1
+
+
+def _retry_after_seconds(value) -> float:
+    """Seconds from a Retry-After header (delta-seconds or HTTP-date), capped at RETRY_AFTER_MAX; 0.0 if absent/invalid."""
+    if not value:
+        return 0.0
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return 0.0
+    return min(max(seconds, 0.0), RETRY_AFTER_MAX)
+
+
+def _is_rate_limited(data) -> bool:
+    """True if Etherscan returned its rate-limit error body (e.g. "Max rate limit reached")."""
+    return (
+        isinstance(data, dict)
+        and data.get("status") == "0"
+        and "rate limit" in str(data.get("result", "")).lower()
+    )
+
+
+def _etherscan_get(params):
     """
-    Fetch normal transactions for a given wallet address.
+    GET the Etherscan API through the shared rate limiter and return the parsed JSON body.
+    Retries with jittered exponential backoff while Etherscan reports a rate limit; the
+    last body is returned if it never clears. HTTP/parse errors (orjson.JSONDecodeError is a
+    ValueError) propagate to the caller.
+    """
+    for attempt in range(RATE_LIMIT_MAX_ATTEMPTS):
+        _throttle()
+        resp = _SESSION.get(ETHERSCAN_API_BASE, params=params, timeout=REQUEST_TIMEOUT)
+        resp.raise_for_status()
+        # orjson parses the (up to MB-sized) txlist body several times faster than resp.json()
+        data = orjson.loads(resp.content)
+        if not _is_rate_limited(data) or attempt == RATE_LIMIT_MAX_ATTEMPTS - 1:
+            return data
+        delay = _backoff_delay(attempt)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Etherscan rate limit for %s; retrying in %.2fs", params.get("address"), delay)
+        time.sleep(delay)
 
-    Args:
-        address: Ethereum address (0x...).
-        limit: Max number of transactions to return (API may cap this).
 
-    Returns:
-        List of transaction dicts, or empty list on error.
+async def _etherscan_get_async(session, params):
     """
-    params = {
+    _etherscan_get on an aiohttp.ClientSession. Shares the process-wide rate limiter; also
+    retries what the sync session leaves to urllib3: RETRY_STATUSES (honoring Retry-After),
+    connection errors and timeouts. The last attempt's error propagates.
+    """
+    for attempt in range(RATE_LIMIT_MAX_ATTEMPTS):
+        last = attempt == RATE_LIMIT_MAX_ATTEMPTS - 1
+        delay = _reserve_call_slot()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        retry_after = 0.0
+        try:
+            async with session.get(ETHERSCAN_API_BASE, params=params) as resp:
+                if resp.status in RETRY_STATUSES and not last:
+                    retry_after = _retry_after_seconds(resp.headers.get("Retry-After"))
+                else:
+                    resp.raise_for_status()
+                    data = orjson.loads(await resp.read())
+                    if not _is_rate_limited(data) or last:
+                        return data
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            if last:
+                raise
+        delay = max(_backoff_delay(attempt), retry_after)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Etherscan call for %s not served; retrying in %.2fs", params.get("address"), delay)
+        await asyncio.sleep(delay)
+
+
+def new_async_session(connector_limit: int = HTTP_POOL_SIZE) -> aiohttp.ClientSession:
+    """aiohttp session for fetch_transactions_async: keep-alive pool of connector_limit, REQUEST_TIMEOUT per call."""
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=connector_limit, keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT),
+        timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+    )
+
+
+def _txlist_params(address, limit, startblock=0):
+    """Etherscan txlist query for the newest `limit` normal transactions of address from startblock on."""
+    return {
         "chainid": CHAIN_ID,
         "module": "account",
         "action": "txlist",
         "address": address,
-        "startblock": 0,
+        "startblock": startblock,
         "endblock": 99999999,
         "page": 1,
         "offset": min(limit, 10000),
@@ -50,16 +200,33 @@ def fetch_transactions(address, limit=100):
         "apikey": API_KEY,
     }
 
-    try:
-        resp = requests.get(ETHERSCAN_API_BASE, params=params, timeout=REQUEST_TIMEOUT)
-        resp.raise_for_status()
-        data = resp.json()
 
-        if data.get("status") != "1" or data.get("message") != "OK":
-            logger.debug("Etherscan API error for %s: %s", address, data.get("message", "unknown"))
+def _txlist_result(address, data):
+    """Transactions from a txlist body; [] if there are none, None if Etherscan reported an error."""
+    if data.get("status") != "1" or data.get("message") != "OK":
+        # Etherscan reports an empty range as status "0" too
+        if data.get("message") == "No transactions found":
             return []
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Etherscan API error for %s: %s", address, data.get("message", "unknown"))
+        return None
+    return data.get("result", [])
 
-        return data.get("result", [])
+
+def fetch_transactions(address, limit=100, startblock=0):
+    """
+    Fetch normal transactions for a given wallet address.
+
+    Args:
+        address: Ethereum address (0x...).
+        limit: Max number of transactions to return (API may cap this).
+        startblock: Only transactions in this block or later.
+
+    Returns:
+        List of transaction dicts, or empty list on error.
+    """
+    try:
+        return _txlist_result(address, _etherscan_get(_txlist_params(address, limit, startblock))) or []
     except requests.exceptions.Timeout:
         logger.warning("Etherscan request timeout for %s (timeout=%ds)", address, REQUEST_TIMEOUT)
         return []
@@ -71,6 +238,32 @@ def fetch_transactions(address, limit=100):
         return []
 
 
+async def fetch_transactions_async(session, address, limit=100, startblock=0):
+    """
+    fetch_transactions on a shared aiohttp.ClientSession (see new_async_session).
+    Same result: list of transaction dicts, or empty list on error.
+    """
+    return await fetch_transactions_since_async(session, address, startblock, limit) or []
+
+
+async def fetch_transactions_since_async(session, address, startblock, limit=100):
+    """
+    Newest `limit` transactions of address from startblock on. Unlike fetch_transactions_async,
+    None on error, so callers can tell "nothing new" ([]) from a failed call.
+    """
+    try:
+        return _txlist_result(address, await _etherscan_get_async(session, _txlist_params(address, limit, startblock)))
+    except asyncio.TimeoutError:
+        logger.warning("Etherscan request timeout for %s (timeout=%ds)", address, REQUEST_TIMEOUT)
+        return None
+    except aiohttp.ClientError as e:
+        logger.warning("Etherscan request failed for %s: %s", address, e)
+        return None
+    except (ValueError, KeyError, TypeError) as e:
+        logger.warning("Etherscan response parse error for %s: %s", address, e)
+        return None
+
+
 def fetch_balance(address):
     """
     Fetch ETH balance for an address (in wei, as string).
@@ -88,9 +281,7 @@ def fetch_balance(address):
     }
 
     try:
-        resp = requests.get(ETHERSCAN_API_BASE, params=params, timeout=REQUEST_TIMEOUT)
-        resp.raise_for_status()
-        data = resp.json()
+        data = _etherscan_get(params)
         if data.get("status") == "1":
             return data.get("result")
         return None
@@ -105,25 +296,136 @@ def fetch_balance(address):
         return None
 
 
+# balancemulti accepts up to 20 addresses per call
+BALANCE_BATCH_MAX = 20
+# How long the first balance request waits for others to join its batch (seconds)
+BALANCE_BATCH_WINDOW = float(os.getenv("BALANCE_BATCH_WINDOW_MS", "50")) / 1000
+
+
+def fetch_balances_batch(addresses):
+    """
+    Fetch ETH balances for up to BALANCE_BATCH_MAX addresses in one balancemulti call.
+
+    Returns:
+        Dict of lowercase address -> balance string in wei. Empty dict on error;
+        addresses missing from the response are absent from the dict.
+    """
+    params = {
+        "chainid": CHAIN_ID,
+        "module": "account",
+        "action": "balancemulti",
+        "address": ",".join(addresses),
+        "tag": "latest",
+        "apikey": API_KEY,
+    }
+
+    try:
+        data = _etherscan_get(params)
+        if data.get("status") != "1" or not isinstance(data.get("result"), list):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Etherscan balancemulti error: %s", data.get("message", "unknown"))
+            return {}
+        return {
+            item["account"].lower(): item.get("balance")
+            for item in data["result"]
+            if isinstance(item, dict) and item.get("account")
+        }
+    except requests.exceptions.Timeout:
+        logger.warning("Etherscan balancemulti request timeout (%d addresses)", len(addresses))
+        return {}
+    except requests.RequestException as e:
+        logger.warning("Etherscan balancemulti request failed: %s", e)
+        return {}
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        logger.warning("Etherscan balancemulti response parse error: %s", e)
+        return {}
+
+
+class BatchedBalanceFetcher:
+    """
+    Thread-safe micro-batcher for balance lookups.
+
+    Concurrent fetch() calls arriving within `window` seconds (or until `max_batch`
+    addresses are queued) are merged into one balancemulti call, so parallel
+    callers consume one rate-limit token per batch instead of one per address.
+    """
+
+    def __init__(self, window: float = BALANCE_BATCH_WINDOW, max_batch: int = BALANCE_BATCH_MAX):
+        self._window = window
+        self._max_batch = max_batch
+        self._lock = threading.Lock()
+        self._pending: list[tuple[str, Future]] = []
+        self._timer = None
+
+    def fetch(self, address: str, timeout: float | None = None):
+        """Return the balance in wei (string) for address, or None on error. Blocks until its batch runs."""
+        future = Future()
+        batch = None
+        with self._lock:
+            self._pending.append((address, future))
+            if len(self._pending) >= self._max_batch:
+                batch = self._take_batch()
+            elif self._timer is None:
+                self._timer = threading.Timer(self._window, self._flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if batch:
+            self._run(batch)
+        return future.result(timeout=timeout)
+
+    def _take_batch(self):
+        """Detach queued requests and cancel the pending flush. Caller holds the lock."""
+        batch, self._pending = self._pending, []
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+
+    def _flush(self):
+        with self._lock:
+            batch = self._take_batch()
+        if batch:
+            self._run(batch)
+
+    def _run(self, batch):
+        addresses = list(dict.fromkeys(address.lower() for address, _ in batch))
+        try:
+            balances = fetch_balances_batch(addresses)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for address, future in batch:
+            future.set_result(balances.get(address.lower()))
+
+
+# Column order of the tuples returned by normalize_tx_for_db (transactions table)
+TX_DB_COLUMNS = (
+    "wallet_address", "tx_hash", "from_address", "to_address",
+    "value_wei", "block_number", "timestamp", "raw_data",
+)
+
+
 def normalize_tx_for_db(tx):
     """
-    Convert Etherscan-style tx object to our DB-friendly format.
+    Convert Etherscan-style tx object to a row for the transactions table.
 
     Args:
         tx: One transaction dict from Etherscan API.
 
     Returns:
-        Dict with keys: wallet_address, tx_hash, from_address, to_address,
-        value_wei, block_number, timestamp, raw_data.
+        Tuple in TX_DB_COLUMNS order, ready for positional binding: wallet_address,
+        tx_hash, from_address, to_address, value_wei, block_number,
+        timestamp (Unix seconds, int), raw_data (JSONB adapter).
     """
     # We consider the wallet as the 'from' or 'to' we're tracking
-    return {
-        "wallet_address": tx.get("from", ""),
-        "tx_hash": tx.get("hash"),
-        "from_address": tx.get("from"),
-        "to_address": tx.get("to"),
-        "value_wei": tx.get("value"),
-        "block_number": tx.get("blockNumber"),
-        "timestamp": tx.get("timeStamp"),
-        "raw_data": tx,
-    }
+    return (
+        tx.get("from", ""),
+        tx.get("hash"),
+        tx.get("from"),
+        tx.get("to"),
+        tx.get("value"),
+        tx.get("blockNumber"),
+        safe_int(tx.get("timeStamp")),
+        Jsonb(tx),
+    )
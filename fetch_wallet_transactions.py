@@ -7,13 +7,25 @@ Run from command line:
 Or import and use:
   from fetch_wallet_transactions import get_transactions
   data = get_transactions("0x...")
+
+Many wallets at once (concurrent, rate-limited):
+  import asyncio
+  from fetch_wallet_transactions import get_many
+  results = asyncio.run(get_many(["0x...", "0x..."]))
 """
 
-import json
+import asyncio
+import atexit
 import os
 import sys
+import threading
+import aiohttp
+import orjson
 import requests
+from cachetools import TTLCache
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Load variables from .env (e.g. ETHERSCAN_API_KEY)
 load_dotenv()
@@ -24,28 +36,63 @@ CHAIN_ID = 1
 
 # How many transactions to fetch per request (max 10000 for Etherscan)
 DEFAULT_LIMIT = 100
+MAX_LIMIT = 10000
 
+# Sent on every request. Accept-Encoding is requests' default (gzip/deflate, plus br/zstd
+# only when a decoder is installed) so large txlist bodies come compressed but always decodable.
+HTTP_HEADERS = {
+    "User-Agent": "WhaleMind/1.0",
+    "Accept-Encoding": requests.utils.DEFAULT_ACCEPT_ENCODING,
+}
 
-def get_transactions(wallet_address):
-    """
-    Fetch the last 100 normal (ETH) transactions for a wallet.
+# One keep-alive session for all calls: reuses the TCP/TLS connection to Etherscan
+# instead of a new handshake per request; transient HTTP errors are retried with backoff
+_SESSION = requests.Session()
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=20,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET"],
+        ),
+    ),
+)
+_SESSION.headers.update(HTTP_HEADERS)
+atexit.register(_SESSION.close)
 
-    Args:
-        wallet_address: Ethereum address (must start with 0x).
+# Successful txlist results, reused for this many seconds (history changes slowly).
+# Errors are never cached, so a retry goes back to Etherscan.
+ETHERSCAN_CACHE_TTL = float(os.getenv("ETHERSCAN_CACHE_TTL", "60"))
+_cache = TTLCache(maxsize=2048, ttl=ETHERSCAN_CACHE_TTL)
+_cache_lock = threading.Lock()
 
-    Returns:
-        JSON-serializable dict with keys:
-          - "ok": bool, True if the request succeeded
-          - "message": str, short description (e.g. "Success" or error message)
-          - "count": int, number of transactions returned
-          - "transactions": list of transaction objects from Etherscan
 
-    Errors (network, invalid key, invalid address) are caught; "ok" will be
-    False and "message" / "transactions" will describe or be empty.
-    """
-    # Build request parameters (Etherscan V2 "txlist" = normal transfers)
-    api_key = os.getenv("ETHERSCAN_API_KEY", "")
-    params = {
+def _cache_key(wallet_address, limit):
+    return (wallet_address.lower(), CHAIN_ID, limit)
+
+
+def _cached_result(wallet_address, limit):
+    """Copy of the cached result for (wallet_address, limit), or None."""
+    with _cache_lock:
+        cached = _cache.get(_cache_key(wallet_address, limit))
+    return dict(cached) if cached is not None else None
+
+
+def _remember(wallet_address, limit, result):
+    """Cache result if the fetch succeeded; returns result."""
+    if result["ok"]:
+        with _cache_lock:
+            _cache[_cache_key(wallet_address, limit)] = result
+    return result
+
+
+def _txlist_params(wallet_address, limit):
+    """Etherscan V2 "txlist" (normal transfers) query for the last `limit` txs (one page)."""
+    return {
         "chainid": CHAIN_ID,
         "module": "account",
         "action": "txlist",
@@ -53,39 +100,29 @@ def get_transactions(wallet_address):
         "startblock": 0,
         "endblock": 99999999,
         "page": 1,
-        "offset": DEFAULT_LIMIT,
+        "offset": limit,
         "sort": "desc",
-        "apikey": api_key,
+        "apikey": os.getenv("ETHERSCAN_API_KEY", ""),
+    }
+
+
+def _error_result(message):
+    """Result dict for a failed fetch."""
+    return {
+        "ok": False,
+        "message": message,
+        "count": 0,
+        "transactions": [],
     }
 
-    try:
-        response = requests.get(ETHERSCAN_API_URL, params=params, timeout=30)
-        response.raise_for_status()  # Raise if HTTP status is 4xx or 5xx
-    except requests.exceptions.Timeout:
-        return {
-            "ok": False,
-            "message": "Request timed out. Try again later.",
-            "count": 0,
-            "transactions": [],
-        }
-    except requests.exceptions.RequestException as e:
-        return {
-            "ok": False,
-            "message": f"Network error: {str(e)}",
-            "count": 0,
-            "transactions": [],
-        }
 
-    # Parse JSON body
+def _result_from_body(body):
+    """Parse an Etherscan response body (bytes) into the get_transactions result dict."""
+    # orjson: several times faster than response.json() on large txlists
     try:
-        data = response.json()
-    except json.JSONDecodeError:
-        return {
-            "ok": False,
-            "message": "Invalid JSON in API response.",
-            "count": 0,
-            "transactions": [],
-        }
+        data = orjson.loads(body)
+    except orjson.JSONDecodeError:
+        return _error_result("Invalid JSON in API response.")
 
     # Etherscan returns status "1" and message "OK" on success
     if data.get("status") == "1" and data.get("message") == "OK":
@@ -109,6 +146,115 @@ def get_transactions(wallet_address):
         }
 
 
+def get_transactions(wallet_address, limit=DEFAULT_LIMIT):
+    """
+    Fetch the last `limit` (default 100) normal (ETH) transactions for a wallet.
+
+    Args:
+        wallet_address: Ethereum address (must start with 0x).
+        limit: Transactions to request, capped at MAX_LIMIT (Etherscan's page size limit).
+
+    Returns:
+        JSON-serializable dict with keys:
+          - "ok": bool, True if the request succeeded
+          - "message": str, short description (e.g. "Success" or error message)
+          - "count": int, number of transactions returned
+          - "transactions": list of transaction objects from Etherscan
+
+    Errors (network, invalid key, invalid address) are caught; "ok" will be
+    False and "message" / "transactions" will describe or be empty.
+    Successful results are cached for ETHERSCAN_CACHE_TTL seconds.
+    """
+    limit = min(limit, MAX_LIMIT)
+    cached = _cached_result(wallet_address, limit)
+    if cached is not None:
+        return cached
+    try:
+        response = _SESSION.get(ETHERSCAN_API_URL, params=_txlist_params(wallet_address, limit), timeout=30)
+        response.raise_for_status()  # Raise if HTTP status is 4xx or 5xx
+    except requests.exceptions.Timeout:
+        return _error_result("Request timed out. Try again later.")
+    except requests.exceptions.RequestException as e:
+        return _error_result(f"Network error: {str(e)}")
+
+    return _remember(wallet_address, limit, _result_from_body(response.content))
+
+
+# Concurrent fetches (get_many): at most this many requests in flight, and request starts
+# spaced to ETHERSCAN_RATE_LIMIT per second (free keys: 5 calls/s)
+ASYNC_MAX_CONCURRENCY = 5
+ETHERSCAN_RATE_LIMIT = int(os.getenv("ETHERSCAN_RATE_LIMIT", "5"))
+
+
+class _AsyncRateLimiter:
+    """Space request starts at least 1/rate seconds apart (one event loop)."""
+
+    def __init__(self, rate):
+        self._interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            delay = self._next - now
+            self._next = max(now, self._next) + self._interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def get_transactions_async(wallet_address, session, semaphore=None, limiter=None, limit=DEFAULT_LIMIT):
+    """
+    Async get_transactions on a shared aiohttp.ClientSession. Same result dict.
+    semaphore / limiter bound concurrency and request rate when fetching many wallets.
+    Shares get_transactions' result cache.
+    """
+    limit = min(limit, MAX_LIMIT)
+    cached = _cached_result(wallet_address, limit)
+    if cached is not None:
+        return cached
+    try:
+        if limiter is not None:
+            await limiter.wait()
+        if semaphore is not None:
+            async with semaphore:
+                body = await _get_body(session, wallet_address, limit)
+        else:
+            body = await _get_body(session, wallet_address, limit)
+    except asyncio.TimeoutError:
+        return _error_result("Request timed out. Try again later.")
+    except aiohttp.ClientError as e:
+        return _error_result(f"Network error: {str(e)}")
+
+    return _remember(wallet_address, limit, _result_from_body(body))
+
+
+async def _get_body(session, wallet_address, limit):
+    """GET the txlist for wallet_address and return the raw body (raises on HTTP/network errors)."""
+    async with session.get(ETHERSCAN_API_URL, params=_txlist_params(wallet_address, limit)) as response:
+        response.raise_for_status()  # Raise if HTTP status is 4xx or 5xx
+        return await response.read()
+
+
+async def get_many(wallet_addresses, limit=DEFAULT_LIMIT):
+    """
+    Fetch transactions for many wallets concurrently, within the Etherscan rate limit.
+    Returns {wallet_address: get_transactions-style result dict}.
+    """
+    semaphore = asyncio.Semaphore(ASYNC_MAX_CONCURRENCY)
+    limiter = _AsyncRateLimiter(ETHERSCAN_RATE_LIMIT)
+    timeout = aiohttp.ClientTimeout(total=30)
+    connector = aiohttp.TCPConnector(limit=20)
+    # aiohttp negotiates and decodes compression itself; only the User-Agent is shared
+    headers = {"User-Agent": HTTP_HEADERS["User-Agent"]}
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers) as session:
+        results = await asyncio.gather(
+            *(get_transactions_async(addr, session, semaphore, limiter, limit) for addr in wallet_addresses)
+        )
+    return dict(zip(wallet_addresses, results))
+
+
 def main():
     """Run from command line: python fetch_wallet_transactions.py <address>"""
     if len(sys.argv) < 2:
@@ -124,7 +270,7 @@ def main():
     result = get_transactions(wallet_address)
 
     # Output JSON to stdout (so you can pipe to a file or other tools)
-    print(json.dumps(result, indent=2))
+    print(orjson.dumps(result, option=orjson.OPT_INDENT_2).decode())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,31 @@
+"""
+WhaleMind MCP - Gunicorn config for the Flask API.
+
+Usage:
+  gunicorn -c gunicorn_conf.py api:app
+
+gevent workers let each process keep hundreds of Etherscan/DB calls in flight
+(cooperative I/O) instead of one blocked OS thread per request.
+Override any setting via the environment variables below.
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gevent")
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count() * 2 + 1)))
+# Concurrent requests per gevent worker. They share the worker's DB_POOL_MAX (default 10)
+# PostgreSQL connections: requests past that wait in db.get_conn for a free one (up to
+# DB_POOL_TIMEOUT, then treat the DB as unavailable), while Etherscan calls continue.
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "500"))
+# Must exceed the Etherscan timeout (ETHERSCAN_REQUEST_TIMEOUT, 25s) plus analysis time
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+
+
+def post_fork(server, worker):
+    """Make psycopg2 yield to the gevent hub while waiting on PostgreSQL."""
+    if worker_class == "gevent":
+        from psycogreen.gevent import patch_psycopg
+
+        patch_psycopg()
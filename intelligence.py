@@ -14,11 +14,20 @@ Scoring dimensions (modular, adjustable):
 Returns: verdict, confidence (0–1), entity_type, human-readable summary.
 """
 
-from collections import defaultdict
-from typing import Any, Callable
+import os
+import threading
+from typing import Any
+
+import numpy as np
+from cachetools import LRUCache
 
 import behavior
 
+try:
+    from numba import njit
+except ImportError:  # optional: NumPy reductions are used instead
+    njit = None
+
 # -----------------------------------------------------------------------------
 # VERDICTS & ENTITY TYPES
 # -----------------------------------------------------------------------------
@@ -70,6 +79,15 @@ RECENCY_SPAN_DAYS_WHALE = 60        # span >= this + few recent → dormant whal
 EXCHANGE_ROTATION_MIN_TXS = 30
 TIMING_MIN_TXS_FOR_PATTERN = 5
 
+# Decimals for floats in metrics_used (default 4)
+METRIC_DECIMALS = {"span_days": 2}
+
+# classify_wallet memo: (wallet, tx-set fingerprint) -> result. The fingerprint changes as
+# soon as a new tx appears, so entries never go stale; LRU eviction bounds memory.
+CLASSIFY_MEMO_SIZE = int(os.getenv("CLASSIFY_MEMO_SIZE", "4096"))
+_classify_memo = LRUCache(maxsize=CLASSIFY_MEMO_SIZE)
+_classify_memo_lock = threading.Lock()
+
 
 def _seconds_to_days(seconds: float) -> float:
     return seconds / (24 * 3600) if seconds else 0.0
@@ -78,10 +96,12 @@ def _seconds_to_days(seconds: float) -> float:
 def _compute_intelligence_metrics(transactions: list, wallet_address: str) -> dict[str, Any]:
     """
     Compute all metrics needed for classification.
-    Reuses behavior.analyze_transactions; adds timing, spikes, ratios.
+    One pass over the txs via behavior.analyze_transactions_extended; timing, spikes and
+    ratios are then derived from its per-tx columns.
     """
-    base = behavior.analyze_transactions(transactions, wallet_address=wallet_address)
-    wallet_lower = (wallet_address or "").lower()
+    base, values_eth, timestamps, is_out, is_in = behavior.analyze_transactions_extended(
+        transactions, wallet_address=wallet_address
+    )
 
     total_in = base["total_in_eth"]
     total_out = base["total_out_eth"]
@@ -103,54 +123,20 @@ def _compute_intelligence_metrics(transactions: list, wallet_address: str) -> di
     inflow_outflow_ratio = (total_in / total_out) if total_out > 0 else (total_in * 10.0 if total_in else 0)
     outflow_inflow_ratio = (total_out / total_in) if total_in > 0 else (total_out * 10.0 if total_out else 0)
 
-    # Recent activity count (for dormancy)
-    recent_tx_count = 0
-    # Large transfer spikes (txs >= SPIKE_ETH)
-    spike_count = 0
-    spike_total_eth = 0.0
-    # Per-direction value lists for "staggered" detection (multiple smaller exits)
-    in_values: list[float] = []
-    out_values: list[float] = []
-    # Timestamps for timing pattern
-    tx_timestamps: list[int] = []
-
-    for tx in transactions:
-        from_addr = (tx.get("from") or "").lower()
-        to_addr = (tx.get("to") or "").lower()
-        value_eth = behavior.wei_to_eth(tx.get("value") or "0")
-        ts = tx.get("timeStamp")
-        try:
-            ts_int = int(ts) if ts is not None else None
-        except (TypeError, ValueError):
-            ts_int = None
-
-        if ts_int is not None:
-            tx_timestamps.append(ts_int)
-            if ts_int >= recent_cutoff_ts:
-                recent_tx_count += 1
-
-        if value_eth >= SPIKE_ETH:
-            spike_count += 1
-            spike_total_eth += value_eth
-
-        if wallet_lower:
-            if from_addr == wallet_lower:
-                out_values.append(value_eth)
-            if to_addr == wallet_lower:
-                in_values.append(value_eth)
+    if len(transactions) >= behavior.NUMPY_MIN_TXS:
+        scan = _scan_columns_np
+    else:
+        scan = _scan_columns
+    recent_tx_count, spike_count, spike_total_eth, num_inflows, num_outflows, median_out, max_same_hour = scan(
+        values_eth, timestamps, is_out, is_in, recent_cutoff_ts
+    )
 
     # Staggered distribution: many smaller outflows (median outflow < large transfer)
-    out_values_sorted = sorted(out_values) if out_values else []
-    median_out = out_values_sorted[len(out_values_sorted) // 2] if out_values_sorted else 0.0
     staggered_exits = (
-        len(out_values) >= 5 and median_out < LARGE_TRANSFER_ETH and total_out > NET_OUTFLOW_MIN_ETH
+        num_outflows >= 5 and median_out < LARGE_TRANSFER_ETH and total_out > NET_OUTFLOW_MIN_ETH
     )
 
     # Repeated timing: same hour of day (UTC) appearing multiple times
-    hour_counts: dict[int, int] = defaultdict(int)
-    for ts in tx_timestamps:
-        hour_counts[(ts // 3600) % 24] += 1
-    max_same_hour = max(hour_counts.values()) if hour_counts else 0
     repeated_timing = max_same_hour >= TIMING_MIN_TXS_FOR_PATTERN
 
     # Total historical flow (in + out) for whale/dormant
@@ -167,18 +153,18 @@ def _compute_intelligence_metrics(transactions: list, wallet_address: str) -> di
         "total_in_eth": total_in,
         "total_out_eth": total_out,
         "net_eth": net_eth,
-        "inflow_outflow_ratio": round(inflow_outflow_ratio, 4) if total_out > 0 else None,
-        "outflow_inflow_ratio": round(outflow_inflow_ratio, 4) if total_in > 0 else None,
+        "inflow_outflow_ratio": inflow_outflow_ratio if total_out > 0 else None,
+        "outflow_inflow_ratio": outflow_inflow_ratio if total_in > 0 else None,
         # Tx frequency (txs per day)
         "total_txs": total_txs,
-        "span_days": round(span_days, 2),
-        "tx_frequency": round(tx_frequency, 4) if tx_frequency else 0.0,
+        "span_days": span_days,
+        "tx_frequency": tx_frequency,
         # Counterparties
         "unique_counterparties": num_counterparties,
         # Large transfers
         "large_transfers_count": large_transfers_count,
         "spike_count": spike_count,
-        "spike_total_eth": round(spike_total_eth, 4),
+        "spike_total_eth": spike_total_eth,
         # Recency
         "recent_tx_count": recent_tx_count,
         "first_seen": first_ts,
@@ -186,71 +172,224 @@ def _compute_intelligence_metrics(transactions: list, wallet_address: str) -> di
         # Derived
         "staggered_exits": staggered_exits,
         "repeated_timing": repeated_timing,
-        "total_flow_eth": round(total_flow_eth, 4),
+        "total_flow_eth": total_flow_eth,
         "historically_large": historically_large,
         "dormant_candidate": dormant_candidate,
-        "num_inflows": len(in_values),
-        "num_outflows": len(out_values),
+        "num_inflows": num_inflows,
+        "num_outflows": num_outflows,
     }
 
 
+def _scan_columns(values_eth, timestamps, is_out, is_in, recent_cutoff_ts: int) -> tuple:
+    """
+    Plain-Python scan of the per-tx columns.
+    Returns (recent_tx_count, spike_count, spike_total_eth, num_inflows, num_outflows,
+    median_out, max_same_hour).
+    """
+    # Large transfer spikes (txs >= SPIKE_ETH)
+    spike_count = 0
+    spike_total_eth = 0.0
+    # Per-direction counts/values for "staggered" detection (multiple smaller exits)
+    num_inflows = 0
+    out_values: list[float] = []
+    for value_eth, outgoing, incoming in zip(values_eth, is_out, is_in):
+        if value_eth >= SPIKE_ETH:
+            spike_count += 1
+            spike_total_eth += value_eth
+        if outgoing:
+            out_values.append(value_eth)
+        if incoming:
+            num_inflows += 1
+
+    # Recent activity count (for dormancy) and hour-of-day (UTC) histogram for timing pattern
+    recent_tx_count = 0
+    hour_counts = [0] * 24
+    for ts in timestamps:
+        hour_counts[(ts // 3600) % 24] += 1
+        if ts >= recent_cutoff_ts:
+            recent_tx_count += 1
+
+    # Below NUMPY_MIN_TXS a sort of the few outflows beats array conversion + np.partition
+    out_values.sort()
+    median_out = out_values[len(out_values) // 2] if out_values else 0.0
+    return (
+        recent_tx_count, spike_count, spike_total_eth, num_inflows, len(out_values), median_out, max(hour_counts)
+    )
+
+
+def _scan_columns_np(values_eth, timestamps, is_out, is_in, recent_cutoff_ts: int) -> tuple:
+    """
+    Vectorized equivalent of _scan_columns over NumPy columns: one compiled pass
+    (_aggregate_jit, with numba) or NumPy masks/reductions (without).
+    """
+    try:
+        ts = np.array(timestamps, dtype=np.int64)
+    except OverflowError:
+        # Timestamps beyond int64: scan plain Python lists so both paths return Python scalars
+        return _scan_columns(values_eth.tolist(), timestamps, is_out.tolist(), is_in.tolist(), recent_cutoff_ts)
+
+    if _aggregate_jit is not None:
+        return _aggregate_jit(values_eth, ts, is_out, is_in, recent_cutoff_ts, SPIKE_ETH)
+
+    is_spike = values_eth >= SPIKE_ETH
+    out_values = values_eth[is_out]
+    num_outflows = len(out_values)
+    return (
+        int(np.count_nonzero(ts >= recent_cutoff_ts)),
+        int(np.count_nonzero(is_spike)),
+        float(values_eth[is_spike].sum()),
+        int(np.count_nonzero(is_in)),
+        num_outflows,
+        _upper_median(out_values),
+        int(np.bincount((ts // 3600) % 24, minlength=24).max()),
+    )
+
+
+def _upper_median(values) -> float:
+    """sorted(values)[len // 2] via O(n) np.partition; 0.0 if empty."""
+    n = len(values)
+    if not n:
+        return 0.0
+    k = n // 2
+    return float(np.partition(values, k)[k])
+
+
+def _aggregate(values, ts, is_out, is_in, recent_cutoff_ts, spike_eth):
+    """
+    Single-pass numeric kernel over SoA columns (compiled with numba when available).
+    Same return tuple as _scan_columns. spike_eth is an argument so the compiled
+    (and on-disk cached) code never bakes in a tunable threshold.
+    """
+    spike_count = 0
+    spike_total_eth = 0.0
+    num_inflows = 0
+    num_outflows = 0
+    for i in range(values.shape[0]):
+        v = values[i]
+        if v >= spike_eth:
+            spike_count += 1
+            spike_total_eth += v
+        if is_in[i]:
+            num_inflows += 1
+        if is_out[i]:
+            num_outflows += 1
+
+    out_values = np.empty(num_outflows, dtype=np.float64)
+    j = 0
+    for i in range(values.shape[0]):
+        if is_out[i]:
+            out_values[j] = values[i]
+            j += 1
+    # O(n) selection of sorted(out_values)[n // 2] instead of a full sort
+    k = num_outflows // 2
+    median_out = np.partition(out_values, k)[k] if num_outflows else 0.0
+
+    hour_counts = np.zeros(24, dtype=np.int64)
+    recent_tx_count = 0
+    for i in range(ts.shape[0]):
+        t = ts[i]
+        hour_counts[(t // 3600) % 24] += 1
+        if t >= recent_cutoff_ts:
+            recent_tx_count += 1
+    return (
+        recent_tx_count, spike_count, spike_total_eth, num_inflows, num_outflows, median_out, hour_counts.max()
+    )
+
+
+# Interpreted, _aggregate would be slower than the NumPy reductions, so only use it compiled
+_aggregate_jit = njit(cache=True)(_aggregate) if njit is not None else None
+
+
 # -----------------------------------------------------------------------------
-# SCORING RULES – (weight, predicate) per verdict. Tune weights to adjust sensitivity.
+# SCORING RULES – one weight per signal, per verdict. Tune weights to adjust sensitivity;
+# the matching predicates are evaluated together in _score_all (same order as the weights).
 # Rules use: inflow/outflow ratio | tx frequency | counterparties | large transfers | recency
 # -----------------------------------------------------------------------------
 
-def _score_signals(metrics: dict[str, Any], signals: list[tuple[float, Callable[[dict], bool]]]) -> float:
-    """Sum weights for all signals whose predicate is True."""
-    return sum(w for w, pred in signals if pred(metrics))
-
-
-# SMART_MONEY_ACCUMULATION: inflow dominance, repeated buys, few counterparties, large inflows
-SIGNALS_ACCUMULATION: list[tuple[float, Callable[[dict], bool]]] = [
-    (0.30, lambda m: (m.get("inflow_outflow_ratio") or 0) >= INFLOW_OUTFLOW_RATIO_ACCUM),
-    (0.25, lambda m: m["net_eth"] >= NET_INFLOW_MIN_ETH),
-    (0.20, lambda m: m["num_inflows"] >= 3 and m["total_in_eth"] >= NET_INFLOW_MIN_ETH),
-    (0.15, lambda m: m["unique_counterparties"] <= COUNTERPARTIES_FEW and m["total_in_eth"] >= LARGE_TRANSFER_ETH),
-    (0.10, lambda m: m["large_transfers_count"] >= LARGE_TRANSFERS_MIN_COUNT),
-]
-MAX_SCORE_ACCUMULATION = sum(w for w, _ in SIGNALS_ACCUMULATION)
-
-# STEALTH_DISTRIBUTION: outflow dominance, staggered exits, distribution pattern
-SIGNALS_DISTRIBUTION: list[tuple[float, Callable[[dict], bool]]] = [
-    (0.30, lambda m: (m.get("outflow_inflow_ratio") or 0) >= OUTFLOW_INFLOW_RATIO_DIST),
-    (0.25, lambda m: m["net_eth"] <= -NET_OUTFLOW_MIN_ETH),
-    (0.20, lambda m: m["staggered_exits"]),
-    (0.15, lambda m: m["num_outflows"] >= 5),
-    (0.10, lambda m: m["spike_count"] >= 1 and m["total_out_eth"] > m["total_in_eth"]),
-]
-MAX_SCORE_DISTRIBUTION = sum(w for w, _ in SIGNALS_DISTRIBUTION)
-
-# EXCHANGE_ROTATION: many counterparties, high tx frequency, routing behavior
-SIGNALS_EXCHANGE_ROTATION: list[tuple[float, Callable[[dict], bool]]] = [
-    (0.35, lambda m: m["unique_counterparties"] >= COUNTERPARTIES_MANY),
-    (0.30, lambda m: m["tx_frequency"] >= TX_FREQ_HIGH_TXS_PER_DAY or m["total_txs"] >= EXCHANGE_ROTATION_MIN_TXS),
-    (0.20, lambda m: m["total_flow_eth"] >= WHALE_HISTORICAL_ETH),
-    (0.15, lambda m: m["repeated_timing"]),
-]
-MAX_SCORE_EXCHANGE_ROTATION = sum(w for w, _ in SIGNALS_EXCHANGE_ROTATION)
-
-# WHALE_DORMANT: low recency (few recent txs), historically large flow
-SIGNALS_WHALE_DORMANT: list[tuple[float, Callable[[dict], bool]]] = [
-    (0.45, lambda m: m["dormant_candidate"]),
-    (0.30, lambda m: m["recent_tx_count"] <= RECENCY_MAX_TXS_DORMANT and m["historically_large"]),
-    (0.25, lambda m: m["span_days"] >= RECENCY_SPAN_DAYS_WHALE and m["recent_tx_count"] <= 2),
-]
-MAX_SCORE_WHALE_DORMANT = sum(w for w, _ in SIGNALS_WHALE_DORMANT)
-
-
-def _compute_all_scores(metrics: dict[str, Any]) -> dict[str, float]:
-    """Return normalized 0–1 score for each verdict."""
-    raw = {
-        VERDICT_SMART_MONEY_ACCUMULATION: _score_signals(metrics, SIGNALS_ACCUMULATION) / MAX_SCORE_ACCUMULATION,
-        VERDICT_STEALTH_DISTRIBUTION: _score_signals(metrics, SIGNALS_DISTRIBUTION) / MAX_SCORE_DISTRIBUTION,
-        VERDICT_EXCHANGE_ROTATION: _score_signals(metrics, SIGNALS_EXCHANGE_ROTATION) / MAX_SCORE_EXCHANGE_ROTATION,
-        VERDICT_WHALE_DORMANT: _score_signals(metrics, SIGNALS_WHALE_DORMANT) / MAX_SCORE_WHALE_DORMANT,
-    }
-    return {k: min(1.0, round(v, 4)) for k, v in raw.items()}
+# SMART_MONEY_ACCUMULATION: inflow dominance, net inflow, repeated buys, few counterparties, large inflows
+WEIGHTS_ACCUMULATION = (0.30, 0.25, 0.20, 0.15, 0.10)
+MAX_SCORE_ACCUMULATION = sum(WEIGHTS_ACCUMULATION)
+
+# STEALTH_DISTRIBUTION: outflow dominance, net outflow, staggered exits, many outflows, spike exits
+WEIGHTS_DISTRIBUTION = (0.30, 0.25, 0.20, 0.15, 0.10)
+MAX_SCORE_DISTRIBUTION = sum(WEIGHTS_DISTRIBUTION)
+
+# EXCHANGE_ROTATION: many counterparties, high tx frequency, large total flow, repeated timing
+WEIGHTS_EXCHANGE_ROTATION = (0.35, 0.30, 0.20, 0.15)
+MAX_SCORE_EXCHANGE_ROTATION = sum(WEIGHTS_EXCHANGE_ROTATION)
+
+# WHALE_DORMANT: dormant candidate, low recency with large history, long span with few recent txs
+WEIGHTS_WHALE_DORMANT = (0.45, 0.30, 0.25)
+MAX_SCORE_WHALE_DORMANT = sum(WEIGHTS_WHALE_DORMANT)
+
+
+def _score_all(m: dict[str, Any]) -> tuple[float, float, float, float]:
+    """
+    Raw (unnormalized) score per verdict: sum of weights whose signal fires.
+    Returns (accumulation, distribution, exchange_rotation, whale_dormant).
+    """
+    net_eth = m["net_eth"]
+    total_in = m["total_in_eth"]
+    total_out = m["total_out_eth"]
+    counterparties = m["unique_counterparties"]
+    recent = m["recent_tx_count"]
+    historically_large = m["historically_large"]
+
+    w = WEIGHTS_ACCUMULATION
+    accumulation = (
+        (w[0] if (m.get("inflow_outflow_ratio") or 0) >= INFLOW_OUTFLOW_RATIO_ACCUM else 0.0)
+        + (w[1] if net_eth >= NET_INFLOW_MIN_ETH else 0.0)
+        + (w[2] if m["num_inflows"] >= 3 and total_in >= NET_INFLOW_MIN_ETH else 0.0)
+        + (w[3] if counterparties <= COUNTERPARTIES_FEW and total_in >= LARGE_TRANSFER_ETH else 0.0)
+        + (w[4] if m["large_transfers_count"] >= LARGE_TRANSFERS_MIN_COUNT else 0.0)
+    )
+
+    w = WEIGHTS_DISTRIBUTION
+    distribution = (
+        (w[0] if (m.get("outflow_inflow_ratio") or 0) >= OUTFLOW_INFLOW_RATIO_DIST else 0.0)
+        + (w[1] if net_eth <= -NET_OUTFLOW_MIN_ETH else 0.0)
+        + (w[2] if m["staggered_exits"] else 0.0)
+        + (w[3] if m["num_outflows"] >= 5 else 0.0)
+        + (w[4] if m["spike_count"] >= 1 and total_out > total_in else 0.0)
+    )
+
+    w = WEIGHTS_EXCHANGE_ROTATION
+    high_activity = m["tx_frequency"] >= TX_FREQ_HIGH_TXS_PER_DAY or m["total_txs"] >= EXCHANGE_ROTATION_MIN_TXS
+    exchange_rotation = (
+        (w[0] if counterparties >= COUNTERPARTIES_MANY else 0.0)
+        + (w[1] if high_activity else 0.0)
+        + (w[2] if m["total_flow_eth"] >= WHALE_HISTORICAL_ETH else 0.0)
+        + (w[3] if m["repeated_timing"] else 0.0)
+    )
+
+    w = WEIGHTS_WHALE_DORMANT
+    whale_dormant = (
+        (w[0] if m["dormant_candidate"] else 0.0)
+        + (w[1] if recent <= RECENCY_MAX_TXS_DORMANT and historically_large else 0.0)
+        + (w[2] if m["span_days"] >= RECENCY_SPAN_DAYS_WHALE and recent <= 2 else 0.0)
+    )
+    return accumulation, distribution, exchange_rotation, whale_dormant
+
+
+# Scored verdicts by index, in _score_all order (earlier index wins ties)
+VERDICT_NAMES = (
+    VERDICT_SMART_MONEY_ACCUMULATION,
+    VERDICT_STEALTH_DISTRIBUTION,
+    VERDICT_EXCHANGE_ROTATION,
+    VERDICT_WHALE_DORMANT,
+)
+ENTITY_NAMES = (ENTITY_WHALE, ENTITY_DISTRIBUTOR, ENTITY_ROUTER, ENTITY_DORMANT_WHALE)
+
+
+def _compute_all_scores(metrics: dict[str, Any]) -> tuple[float, float, float, float]:
+    """Return normalized 0–1 score per verdict, indexed like VERDICT_NAMES."""
+    accumulation, distribution, exchange_rotation, whale_dormant = _score_all(metrics)
+    return (
+        min(1.0, round(accumulation / MAX_SCORE_ACCUMULATION, 4)),
+        min(1.0, round(distribution / MAX_SCORE_DISTRIBUTION, 4)),
+        min(1.0, round(exchange_rotation / MAX_SCORE_EXCHANGE_ROTATION, 4)),
+        min(1.0, round(whale_dormant / MAX_SCORE_WHALE_DORMANT, 4)),
+    )
 
 
 # Confidence: blend of signal strength, margin over second-best, and data quality
@@ -264,8 +403,8 @@ DATA_QUALITY_TXS_CEILING = 80      # txs above this = full data quality
 
 
 def _compute_confidence(
-    best_verdict: str,
-    scores: dict[str, float],
+    best: int,
+    scores: tuple[float, ...],
     metrics: dict[str, Any],
     neutral_fallback: bool,
 ) -> float:
@@ -278,9 +417,8 @@ def _compute_confidence(
     if neutral_fallback:
         return round(CONFIDENCE_MIN + 0.15, 2)  # fixed low confidence for NEUTRAL
 
-    strength = scores[best_verdict]
-    ordered = sorted(scores.items(), key=lambda x: -x[1])
-    second_score = ordered[1][1] if len(ordered) > 1 else 0.0
+    strength = scores[best]
+    second_score = sorted(scores)[-2] if len(scores) > 1 else 0.0
     margin = min(1.0, max(0.0, strength - second_score))
 
     txs = metrics.get("total_txs", 0)
@@ -306,24 +444,17 @@ def _pick_verdict_and_confidence(metrics: dict[str, Any]) -> tuple[str, str, flo
     Score each verdict; return best verdict, entity_inference, confidence (0–1), behavior_summary.
     """
     scores = _compute_all_scores(metrics)
-    best_verdict = max(scores, key=scores.get)
-    best_score = scores[best_verdict]
+    best_score = max(scores)
+    best = scores.index(best_score)  # first maximum, as VERDICT_NAMES order breaks ties
 
     # Require minimum signal for non-NEUTRAL
     neutral_fallback = best_score < 0.30
     if neutral_fallback:
-        best_verdict = VERDICT_NEUTRAL
-
-    entity_map = {
-        VERDICT_SMART_MONEY_ACCUMULATION: ENTITY_WHALE,
-        VERDICT_STEALTH_DISTRIBUTION: ENTITY_DISTRIBUTOR,
-        VERDICT_EXCHANGE_ROTATION: ENTITY_ROUTER,
-        VERDICT_WHALE_DORMANT: ENTITY_DORMANT_WHALE,
-        VERDICT_NEUTRAL: ENTITY_UNKNOWN,
-    }
-    entity_inference = entity_map[best_verdict]
+        best_verdict, entity_inference = VERDICT_NEUTRAL, ENTITY_UNKNOWN
+    else:
+        best_verdict, entity_inference = VERDICT_NAMES[best], ENTITY_NAMES[best]
 
-    confidence = _compute_confidence(best_verdict, scores, metrics, neutral_fallback)
+    confidence = _compute_confidence(best, scores, metrics, neutral_fallback)
     summary = _behavior_summary(best_verdict, metrics, best_score)
     return best_verdict, entity_inference, confidence, summary
 
@@ -387,6 +518,13 @@ def classify_wallet(
             "metrics_used": {} if include_metrics else None,
         }
 
+    key = _classify_memo_key(transactions, wallet_address, include_metrics)
+    if key is not None:
+        with _classify_memo_lock:
+            cached = _classify_memo.get(key)
+        if cached is not None:
+            return _copy_result(cached, wallet_address)
+
     metrics = _compute_intelligence_metrics(transactions, wallet_address)
     verdict, entity_inference, confidence, behavior_summary = _pick_verdict_and_confidence(metrics)
 
@@ -399,8 +537,32 @@ def classify_wallet(
         "behavior_summary": behavior_summary,
     }
     if include_metrics:
+        # Metrics stay full precision for scoring; round only in the output
         out["metrics_used"] = {
-            k: (round(v, 4) if isinstance(v, float) else v)
+            k: (round(v, METRIC_DECIMALS.get(k, 4)) if isinstance(v, float) else v)
             for k, v in metrics.items()
         }
+    if key is not None:
+        with _classify_memo_lock:
+            _classify_memo[key] = _copy_result(out, wallet_address)
+    return out
+
+
+def _copy_result(result: dict[str, Any], wallet_address: str) -> dict[str, Any]:
+    """Memo entries are shared: copy the result and its metrics dict (values are scalars)."""
+    out = {**result, "address": wallet_address}
+    if out.get("metrics_used"):
+        out["metrics_used"] = dict(out["metrics_used"])
     return out
+
+
+def _classify_memo_key(transactions: list, wallet_address: str, include_metrics: bool):
+    """
+    (wallet, len, newest hash, oldest hash, include_metrics) for a non-empty tx list, else None.
+    Etherscan lists are sorted, so a new tx changes the length and one end hash.
+    """
+    first_hash = transactions[0].get("hash")
+    last_hash = transactions[-1].get("hash")
+    if not first_hash or not last_hash:
+        return None
+    return ((wallet_address or "").lower(), len(transactions), first_hash, last_hash, include_metrics)
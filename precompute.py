@@ -9,127 +9,288 @@ Usage:
   python precompute.py 0x... 0x...                  # list of addresses
   python precompute.py --file path/to/wallets.txt   # one address per line
 
-Exits 0 on success, 1 on failure. Non-fatal per-wallet errors are logged.
+Wallets are processed concurrently (PRECOMPUTE_CONCURRENCY at a time, within the
+Etherscan rate limit). Exits 0 on success, 1 on failure. Non-fatal per-wallet errors are logged.
 """
 
 import argparse
+import asyncio
+import hashlib
+import mmap
+import multiprocessing
 import os
 import re
 import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
 from datetime import datetime, timezone
 from pathlib import Path
 
-from dotenv import load_dotenv
-
 import data_fetch
 import db
 import intelligence
+from behavior import safe_int
 from config import get_logger, setup_logging
 
-load_dotenv()
+# .env is already loaded by config (imported above), before any getenv below
 logger = get_logger(__name__)
 
 # Same limit as API (keeps Etherscan calls bounded)
 TX_LIMIT = int(os.getenv("PRECOMPUTE_TX_LIMIT", "100"))
 
+# Wallets in flight at once. Etherscan calls stay within ETHERSCAN_RATE_LIMIT regardless;
+# this bounds how many fetches queue on it and how many classify/save jobs run in threads.
+PRECOMPUTE_CONCURRENCY = int(os.getenv("PRECOMPUTE_CONCURRENCY", "16"))
+
+# Processes for classify_wallet (CPU-bound; threads would serialize on the GIL). Small runs
+# stay on threads, where process start-up would cost more than it saves.
+PRECOMPUTE_CLASSIFY_WORKERS = int(os.getenv("PRECOMPUTE_CLASSIFY_WORKERS", str(os.cpu_count() or 1)))
+PRECOMPUTE_PROCESS_MIN_WALLETS = int(os.getenv("PRECOMPUTE_PROCESS_MIN_WALLETS", "50"))
+
+# Classified wallets are written with one bulk UPSERT per table every this many wallets
+PRECOMPUTE_FLUSH_ROWS = int(os.getenv("PRECOMPUTE_FLUSH_ROWS", "500"))
+
+# Runs this large drop the secondary indexes and rebuild them once at the end (db.precompute_bulk_context)
+PRECOMPUTE_REBUILD_INDEXES_MIN_WALLETS = int(os.getenv("PRECOMPUTE_REBUILD_INDEXES_MIN_WALLETS", "5000"))
+
+# Verdict -> short whale_intel behavior label
+_VERDICT_TO_BEHAVIOR = {
+    "SMART_MONEY_ACCUMULATION": "accumulation",
+    "STEALTH_DISTRIBUTION": "distribution",
+    "EXCHANGE_ROTATION": "exchange_rotation",
+    "WHALE_DORMANT": "dormant",
+    "NEUTRAL": "neutral",
+}
+
 # Valid Ethereum address
 WALLET_PATTERN = re.compile(r"^0x[a-fA-F0-9]{40}$")
+# Same, scanning whole inputs in one pass: a line holding only an address (wallet files,
+# matched on the raw bytes)...
+WALLET_LINE_PATTERN = re.compile(rb"^[^\S\n]*(0x[a-fA-F0-9]{40})[^\S\n]*$", re.MULTILINE)
+# ...or an address between whitespace/comma separators (WALLETS env)
+WALLET_TOKEN_PATTERN = re.compile(r"(?<![^\s,])0x[a-fA-F0-9]{40}(?![^\s,])")
 
 
 def _validate_wallet(addr: str) -> bool:
-    """Return True if address looks valid."""
-    return bool(addr and isinstance(addr, str) and WALLET_PATTERN.match(addr.strip()))
+    """Return True if address looks valid. Expects an already stripped str."""
+    return WALLET_PATTERN.match(addr) is not None
 
 
-def _analyze_and_save(wallet: str) -> tuple[bool, str]:
+async def _analyze_async(session, wallet: str, executor, state: tuple | None = None) -> tuple[bool, str, tuple | None]:
     """
-    Fetch transactions, run intelligence classification, save to DB.
-    Returns (success, message). Never raises; logs and returns (False, msg) on error.
+    Fetch on the event loop, then classify on executor (CPU-bound; thread or process pool). Same result as _classify;
+    saving is left to the caller so rows can be written in bulk. state is the stored
+    (tx_key, last_block) from db.get_precompute_state: when nothing arrived after last_block
+    or the fetched txs match tx_key, classification is skipped and rows is None.
+    Never raises.
     """
-    wallet = wallet.strip()
     if not _validate_wallet(wallet):
-        return False, f"Invalid address: {wallet}"
+        return False, f"Invalid address: {wallet}", None
+    known_tx_key, last_block = state or (None, None)
 
     try:
-        transactions = data_fetch.fetch_transactions(wallet, limit=TX_LIMIT)
+        transactions = None
+        if last_block is not None:
+            # Cheap probe: only txs after the last block seen (usually none, tiny body)
+            new_txs = await data_fetch.fetch_transactions_since_async(session, wallet, last_block + 1, limit=TX_LIMIT)
+            if new_txs == []:
+                return True, f"{wallet} unchanged", None
+            if new_txs is not None and len(new_txs) >= min(TX_LIMIT, 10000):
+                transactions = new_txs  # the whole newest window is new
+        if transactions is None:
+            transactions = await data_fetch.fetch_transactions_async(session, wallet, limit=TX_LIMIT)
     except Exception as e:
         logger.warning("Etherscan fetch failed for %s: %s", wallet, e)
-        return False, f"Etherscan fetch failed: {wallet}"
+        return False, f"Etherscan fetch failed: {wallet}", None
+    if known_tx_key is not None and _tx_key(transactions) == known_tx_key:
+        return True, f"{wallet} unchanged", None
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, _classify, wallet, transactions)
 
+
+def _classify(wallet: str, transactions: list) -> tuple[bool, str, tuple | None]:
+    """
+    Classify fetched transactions. Returns (success, message, rows) where rows is the
+    (wallet_intelligence row, whale_intel row) pair for _save_rows. Never raises.
+    """
     try:
         result = intelligence.classify_wallet(transactions, wallet, include_metrics=True)
     except Exception as e:
         logger.warning("Classification failed for %s: %s", wallet, e)
-        return False, f"Classification failed: {wallet}"
+        return False, f"Classification failed: {wallet}", None
 
     verdict = result["verdict"]
     confidence = result["confidence"]
     entity_type = result.get("entity_type") or result["entity_inference"]
     summary = result["behavior_summary"]
-    metrics = result.get("metrics_used")
-
-    ok = db.save_wallet_intelligence_cache(
-        address=wallet,
-        verdict=verdict,
-        confidence=confidence,
-        entity_type=entity_type,
-        behavior_json=metrics,
-        summary=summary,
+    # Encode here, in the classify worker, so the DB flush only ships text
+    behavior_json = db.encode_behavior_json(result.get("metrics_used"))
+
+    rows = (
+        (wallet, verdict, confidence, entity_type, behavior_json, summary, _tx_key(transactions), _last_block(transactions)),
+        (wallet, _VERDICT_TO_BEHAVIOR.get(verdict, "neutral"), confidence, verdict),
     )
-    if not ok:
-        return False, f"DB save failed: {wallet}"
+    return True, f"{wallet} -> {verdict} ({confidence})", rows
+
 
+def _tx_key(transactions: list) -> str:
+    """
+    Cheap fingerprint of a fetched tx list: count plus newest and oldest hash. Etherscan
+    returns a sorted window, so any new tx changes it.
+    """
+    first = transactions[0].get("hash") or "" if transactions else ""
+    last = transactions[-1].get("hash") or "" if transactions else ""
+    return hashlib.blake2b(f"{len(transactions)}:{first}:{last}".encode(), digest_size=16).hexdigest()
+
+
+def _last_block(transactions: list) -> int | None:
+    """Highest blockNumber among transactions, or None if there are none."""
+    return max((safe_int(tx.get("blockNumber")) for tx in transactions), default=None)
+
+
+def _save_rows(rows: list[tuple], unchanged: list[str] = ()) -> bool:
+    """
+    Write _classify row pairs with one bulk UPSERT per table, and refresh last_updated of
+    the unchanged wallets' rows. Returns True if wallet_intelligence was written; the
+    whale_intel update is non-fatal.
+    """
+    if unchanged and not db.touch_wallet_intelligence_many(unchanged):
+        return False
+    if not rows:
+        return True
+    if not db.save_wallet_intelligence_cache_many([intel for intel, _ in rows]):
+        return False
     # Also update whale_intel for consistency (non-fatal)
+    if not db.save_wallet_intel_many([whale for _, whale in rows]):
+        logger.warning("whale_intel save failed for %d wallet(s)", len(rows))
+    return True
+
+
+async def _process_all(wallets: list[str], quiet: bool) -> tuple[int, int]:
+    """
+    Analyze every wallet with PRECOMPUTE_CONCURRENCY worker tasks pulling from one shared
+    iterator (so only that many wallets are ever scheduled, however long the list), saving
+    results in bulk every PRECOMPUTE_FLUSH_ROWS wallets and once at the end. Stored tx
+    keys / last blocks are read up front in one query; unchanged wallets skip
+    classification. Per-wallet output lines are buffered and written at each flush.
+    wallets must already be stripped (the CLI and loaders return them that way).
+    Returns (ok, failed).
+    """
+    total = len(wallets)
+    loop = asyncio.get_running_loop()
+    # One worker per DB pool connection at most, so saves never exhaust the pool
+    executor = ThreadPoolExecutor(max_workers=max(1, min(PRECOMPUTE_CONCURRENCY, db.DB_POOL_MAX)))
+    classify_executor = executor
+    if PRECOMPUTE_CLASSIFY_WORKERS > 1 and total >= PRECOMPUTE_PROCESS_MIN_WALLETS:
+        # spawn: never fork a process that already runs threads and an event loop
+        classify_executor = ProcessPoolExecutor(
+            max_workers=PRECOMPUTE_CLASSIFY_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    pending: list[tuple] = []
+    unchanged: list[str] = []
+    out_lines: list[str] = []
+    err_lines: list[str] = []
+    save_failures = 0
+    ok_count = 0
+
+    async def flush():
+        nonlocal save_failures
+        batch, touched = pending[:], unchanged[:]
+        pending.clear()
+        unchanged.clear()
+        _write_lines(sys.stdout, out_lines)
+        _write_lines(sys.stderr, err_lines)
+        if (batch or touched) and not await loop.run_in_executor(executor, _save_rows, batch, touched):
+            failed = [r[0][0] for r in batch] + touched
+            save_failures += len(failed)
+            logger.error("DB save failed for %d wallet(s): %s", len(failed), ", ".join(failed))
+
+    async def run_one(i: int, wallet: str, session) -> bool:
+        success, msg, rows = await _analyze_async(session, wallet, classify_executor, states.get(wallet))
+        if success:
+            if rows is None:
+                unchanged.append(wallet)
+            else:
+                pending.append(rows)
+            if not quiet:
+                out_lines.append(f"  [{i}/{total}] {msg}")
+            if len(pending) + len(unchanged) >= PRECOMPUTE_FLUSH_ROWS:
+                await flush()
+        else:
+            err_lines.append(f"  [{i}/{total}] FAIL: {msg}")
+        return success
+
+    # Shared by all workers; next() never awaits, so each wallet is taken exactly once
+    todo = enumerate(wallets, 1)
+
+    async def worker(session):
+        nonlocal ok_count
+        for i, wallet in todo:
+            try:
+                success = await run_one(i, wallet, session)
+            except Exception as e:
+                logger.error("Wallet %s failed: %s", wallet, e, exc_info=e)
+            else:
+                ok_count += success
+
     try:
-        behavior_label = _verdict_to_behavior(verdict)
-        db.save_wallet_intel(wallet, behavior_label, confidence, verdict)
-    except Exception as e:
-        logger.warning("whale_intel save failed for %s: %s", wallet, e)
+        states = await loop.run_in_executor(executor, db.get_precompute_state, wallets)
+        async with data_fetch.new_async_session() as session:
+            await asyncio.gather(*(worker(session) for _ in range(max(1, min(PRECOMPUTE_CONCURRENCY, total)))))
+        await flush()
+    finally:
+        executor.shutdown(wait=True)
+        if classify_executor is not executor:
+            classify_executor.shutdown(wait=True)
+
+    ok_count -= save_failures
+    return ok_count, total - ok_count
+
 
-    return True, f"{wallet} -> {verdict} ({confidence})"
+def _dedupe_wallets(wallets: list[str]) -> list[str]:
+    """
+    Drop repeated addresses, comparing case-insensitively (checksummed vs lowercase) but
+    keeping the first spelling as given, since rows are stored under that exact string.
+    """
+    first: dict[str, str] = {}
+    for wallet in wallets:
+        first.setdefault(wallet.lower(), wallet)
+    return list(first.values())
 
 
-def _verdict_to_behavior(verdict: str) -> str:
-    """Map verdict to short behavior label."""
-    m = {
-        "SMART_MONEY_ACCUMULATION": "accumulation",
-        "STEALTH_DISTRIBUTION": "distribution",
-        "EXCHANGE_ROTATION": "exchange_rotation",
-        "WHALE_DORMANT": "dormant",
-        "NEUTRAL": "neutral",
-    }
-    return m.get(verdict, "neutral")
+def _write_lines(stream, lines: list[str]):
+    """Write and clear buffered output lines with one write call."""
+    if lines:
+        stream.write("\n".join(lines) + "\n")
+        stream.flush()
+        lines.clear()
 
 
 def _load_wallets_from_file(path: str | Path) -> list[str]:
-    """Load addresses from file, one per line. Skips empty and invalid."""
+    """
+    Load addresses from file, one per line, deduplicated in order. Skips empty, comment and
+    invalid lines. The file is memory-mapped and scanned as bytes, so large dumps are never
+    copied into a str or a list of lines.
+    """
     path = Path(path)
     if not path.exists():
         return []
     try:
-        text = path.read_text(encoding="utf-8")
+        with open(path, "rb") as f:
+            if not os.fstat(f.fileno()).st_size:
+                return []
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                found = dict.fromkeys(WALLET_LINE_PATTERN.findall(mm))
     except Exception as e:
         logger.warning("Could not read wallet file %s: %s", path, e)
         return []
-    addresses = []
-    for line in text.splitlines():
-        line = line.strip()
-        if line and not line.startswith("#") and _validate_wallet(line):
-            addresses.append(line.strip())
-    return addresses
+    # One decode for the whole list rather than one per address
+    return b"\n".join(found).decode("ascii").split("\n") if found else []
 
 
 def _load_wallets_from_env() -> list[str]:
-    """Load addresses from WALLETS env (comma- or newline-separated)."""
-    raw = os.getenv("WALLETS", "").strip()
-    if not raw:
-        return []
-    addresses = []
-    for part in re.split(r"[\s,]+", raw):
-        part = part.strip()
-        if part and _validate_wallet(part):
-            addresses.append(part)
-    return addresses
+    """Load addresses from WALLETS env (comma- or newline-separated), deduplicated in order."""
+    return list(dict.fromkeys(WALLET_TOKEN_PATTERN.findall(os.getenv("WALLETS", ""))))
 
 
 def main() -> int:
@@ -153,7 +314,7 @@ def main() -> int:
 
     wallets: list[str] = []
     if args.addresses:
-        wallets = [a for a in args.addresses if _validate_wallet(a)]
+        wallets = [a for a in (a.strip() for a in args.addresses) if _validate_wallet(a)]
     elif args.file:
         wallets = _load_wallets_from_file(args.file)
         if not wallets:
@@ -169,6 +330,7 @@ def main() -> int:
     if not wallets:
         logger.error("No wallets to process. Provide addresses, --file, or set WALLETS env.")
         return 1
+    wallets = _dedupe_wallets(wallets)
 
     setup_logging()
     # Ensure DB tables exist
@@ -180,23 +342,14 @@ def main() -> int:
         logger.error("DATABASE_URL not set. Cannot store results.")
         return 1
 
-    logger.info("Precompute: %d wallet(s)", len(wallets))
-    ok_count = 0
-    fail_count = 0
-
-    for i, wallet in enumerate(wallets, 1):
-        try:
-            success, msg = _analyze_and_save(wallet)
-            if success:
-                ok_count += 1
-                if not args.quiet:
-                    print(f"  [{i}/{len(wallets)}] {msg}")
-            else:
-                fail_count += 1
-                print(f"  [{i}/{len(wallets)}] FAIL: {msg}", file=sys.stderr)
-        except Exception as e:
-            fail_count += 1
-            logger.exception("Wallet %s failed: %s", wallet, e)
+    logger.info("Precompute: %d wallet(s), concurrency %d", len(wallets), PRECOMPUTE_CONCURRENCY)
+    bulk = db.precompute_bulk_context() if len(wallets) >= PRECOMPUTE_REBUILD_INDEXES_MIN_WALLETS else nullcontext()
+    try:
+        with bulk:
+            ok_count, fail_count = asyncio.run(_process_all(wallets, args.quiet))
+    except Exception as e:
+        logger.error("Precompute failed: %s", e)
+        return 1
 
     logger.info("Precompute done: %d ok, %d failed", ok_count, fail_count)
     return 0 if fail_count == 0 else 1
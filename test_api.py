@@ -2,15 +2,21 @@
 Simple test script for the local WhaleMind API.
 
 Usage:
-  python test_api.py [wallet_address]
+  python test_api.py [wallet_address ...] [--concurrency N]
 
-  If no address is given, uses a sample Ethereum address.
+  If no address is given, uses a sample Ethereum address. Several addresses are sent
+  concurrently (at most --concurrency requests in flight), so the script doubles as a
+  light load test.
   Ensure the API is running (e.g. python api.py) before running this script.
 """
 
-import json
+import argparse
+import asyncio
 import sys
-import requests
+import time
+
+import aiohttp
+import orjson
 
 # Local API base URL (change if you run on a different host/port)
 API_BASE = "http://127.0.0.1:5000"
@@ -18,44 +24,95 @@ API_BASE = "http://127.0.0.1:5000"
 # Sample address (Ethereum Foundation) if none provided
 DEFAULT_WALLET = "0xde0B295669a9FD93d5F28D9Ec85E40f4cb697BAe"
 
+# Per-request timeout in seconds
+REQUEST_TIMEOUT = 60
 
-def main():
-    wallet = sys.argv[1].strip() if len(sys.argv) > 1 else DEFAULT_WALLET
-
-    print(f"Calling WhaleMind API for wallet: {wallet}")
-    print("-" * 50)
 
-    try:
-        # POST /analyze with JSON body
-        resp = requests.post(
+async def _analyze(session: aiohttp.ClientSession, semaphore: asyncio.Semaphore, wallet: str):
+    """POST /analyze for one wallet. Returns (status, body bytes, seconds); raises on transport errors."""
+    async with semaphore:
+        start = time.perf_counter()
+        async with session.post(
             f"{API_BASE}/analyze",
-            json={"wallet": wallet},
+            data=orjson.dumps({"wallet": wallet}),
             headers={"Content-Type": "application/json"},
-            timeout=60,
-        )
-    except requests.exceptions.ConnectionError:
+        ) as resp:
+            body = await resp.read()
+        return resp.status, body, time.perf_counter() - start
+
+
+def _report(wallet: str, result) -> bool:
+    """Print one wallet's outcome. Returns True if the API answered 2xx with JSON."""
+    print(f"Wallet: {wallet}")
+    print("-" * 50)
+    if isinstance(result, aiohttp.ClientConnectionError):
         print("Error: Could not connect to the API. Is it running? (e.g. python api.py)")
-        sys.exit(1)
-    except requests.exceptions.Timeout:
+        return False
+    if isinstance(result, asyncio.TimeoutError):
         print("Error: Request timed out.")
-        sys.exit(1)
+        return False
+    if isinstance(result, BaseException):
+        print(f"Error: {result!r}")
+        return False
 
-    print(f"Status: {resp.status_code}")
+    status, body, elapsed = result
+    print(f"Status: {status} ({elapsed:.2f}s)")
     print()
 
     try:
-        data = resp.json()
-    except json.JSONDecodeError:
-        print("Response (raw):", resp.text)
-        sys.exit(1)
+        data = orjson.loads(body)
+    except orjson.JSONDecodeError:
+        print("Response (raw):", body.decode(errors="replace"))
+        return False
 
-    if not resp.ok:
-        print("Error response:", json.dumps(data, indent=2))
-        sys.exit(1)
+    if not 200 <= status < 300:
+        print("Error response:", orjson.dumps(data, option=orjson.OPT_INDENT_2).decode())
+        return False
 
     # Pretty-print the result
     print("Result:")
-    print(json.dumps(data, indent=2))
+    print(orjson.dumps(data, option=orjson.OPT_INDENT_2).decode())
+    return True
+
+
+async def _run(wallets: list[str], concurrency: int) -> list:
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        return await asyncio.gather(
+            *(_analyze(session, semaphore, wallet) for wallet in wallets),
+            return_exceptions=True,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Call the local WhaleMind API /analyze endpoint")
+    parser.add_argument("wallets", nargs="*", help=f"Wallet address(es) (default: {DEFAULT_WALLET})")
+    parser.add_argument(
+        "--concurrency", "-c",
+        type=int,
+        default=10,
+        help="Maximum requests in flight at once (default: 10)",
+    )
+    args = parser.parse_args()
+    wallets = [w.strip() for w in args.wallets] or [DEFAULT_WALLET]
+
+    print(f"Calling WhaleMind API for {len(wallets)} wallet(s), concurrency {args.concurrency}")
+    print("=" * 50)
+
+    start = time.perf_counter()
+    results = asyncio.run(_run(wallets, args.concurrency))
+    elapsed = time.perf_counter() - start
+
+    ok_count = 0
+    for wallet, result in zip(wallets, results):
+        ok_count += _report(wallet, result)
+        print()
+    if len(wallets) > 1:
+        print("=" * 50)
+        print(f"{ok_count}/{len(wallets)} ok in {elapsed:.2f}s")
+    if ok_count != len(wallets):
+        sys.exit(1)
 
 
 if __name__ == "__main__":